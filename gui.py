@@ -1,10 +1,13 @@
 import pygame
+import os
 import sys
-import time
 import copy
+import atexit
 import logging
-from sudoku import solve_sudoku, generate_random_puzzle
-from sudoku_utils import is_valid_sudoku, get_filled_cells_range, is_board_complete
+from sudoku_pool import PuzzlePool
+from sudoku_worker import SolveWorker
+from sudoku_cache import SolutionCache
+from sudoku_utils import is_valid_sudoku, get_filled_cells_range, board_geometry, UnitCounters, ROW_CELLS, COL_CELLS, BOX_CELLS, UNITS_OF
 
 logging.basicConfig(filename='sudoku_agent.log', level=logging.INFO, format='%(message)s', filemode='w')
 logging.info("Sudoku Agent Log\n")
@@ -31,15 +34,102 @@ cell_margin = 10
 board_size = 9 * cell_size + 10 * cell_margin
 board_start_x = 15
 board_start_y = 15
-number_font = pygame.font.SysFont(None, 45)
 subgrid_size = 3 * (cell_size+2) + 2 * (cell_margin+5)
 
 window = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Sudoku Game")
 background_image = pygame.image.load("photo.webp")
 background_image = pygame.transform.scale(background_image, (WIDTH, HEIGHT))
-font = pygame.font.SysFont(None, 40)
-button_font = pygame.font.SysFont(None, 30)
+
+# Fonts are loaded once per size and rendered text is kept, a frame only blits cached surfaces
+fonts = {}
+text_surfaces = {}
+FPS = 30
+clock = pygame.time.Clock()
+
+def render_text(text, size, color):
+    key = (text, size, color)
+    if key not in text_surfaces:
+        # The solving timer renders a new string every tenth of a second, keep the cache bounded
+        if len(text_surfaces) > 512:
+            text_surfaces.clear()
+        if size not in fonts:
+            fonts[size] = pygame.font.SysFont(None, size)
+        text_surfaces[key] = fonts[size].render(text, True, color)
+    return text_surfaces[key]
+
+# Everything left of the side panel is the board, the side panel holds the texts and buttons
+board_area = board_start_x + 9 * (cell_size + cell_margin) + cell_margin
+BOARD_AREA = pygame.Rect(0, 0, board_area, HEIGHT)
+PANEL_AREA = pygame.Rect(board_area, 0, WIDTH - board_area, HEIGHT)
+
+def board_layout(size):
+    # (cell size, gap between cells, subgrid outline width) of a size x size board drawn in the
+    # area of the 9x9 board, the 9x9 values are the original constants
+    if size == 9:
+        return cell_size, cell_margin, 7
+    pitch = (board_area - board_start_x - cell_margin) // size
+    margin = max(4, pitch // 8)
+    return pitch - margin, margin, max(1, margin - 3)
+
+def build_board_surfaces(size):
+    # Empty cells and subgrid outlines never change, they are drawn once per board size. Filled cells
+    # get one finished tile per value: the empty cell, the grey fill and the number. The subgrid
+    # outline reaches into the top-left cell of each subgrid and is drawn over it there.
+    cell, margin, outline = board_layout(size)
+    box = board_geometry(size).box
+    subgrid = box * (cell + margin) + margin - 4
+    radius = 15 if size == 9 else max(2, 15 * (cell + margin) // 80)
+    number_font = pygame.font.SysFont(None, 45 if size == 9 else max(16, 45 * cell // 70))
+
+    background = pygame.Surface((board_area, board_area))
+    background.fill(BACKGROUND)
+    for i in range(size):
+        for j in range(size):
+            cell_x = board_start_x + j * (cell + margin)
+            cell_y = board_start_y + i * (cell + margin)
+            pygame.draw.rect(background, WHITE, (cell_x, cell_y, cell, cell), border_radius=3)
+            pygame.draw.rect(background, (0, 0, 0), (cell_x, cell_y, cell, cell), 1)
+            if i % box == 0 and j % box == 0:
+                pygame.draw.rect(background, BLACK, (cell_x - margin +3, cell_y - margin+3, subgrid, subgrid), outline, border_radius=radius)
+
+    tiles = {False: [None], True: [None]}
+    for corner in (False, True):
+        for num in range(1, size + 1):
+            surface = background.copy()
+            pygame.draw.rect(surface, GREY, (board_start_x, board_start_y, cell, cell), border_radius=3)
+            text_surface = number_font.render(str(num), True, BUTTON_TEXT)
+            surface.blit(text_surface, text_surface.get_rect(center=(board_start_x + cell / 2, board_start_y + cell / 2)))
+            if corner:
+                pygame.draw.rect(surface, BLACK, (board_start_x - margin +3, board_start_y - margin+3, subgrid, subgrid), outline, border_radius=radius)
+            tiles[corner].append(surface.subsurface((board_start_x, board_start_y, cell, cell)).copy())
+    return background, tiles[False], tiles[True]
+
+board_surfaces = {}
+
+def get_board_surfaces(size):
+    if size not in board_surfaces:
+        board_surfaces[size] = build_board_surfaces(size)
+    return board_surfaces[size]
+
+def grid_state(grid):
+    return tuple(tuple(row) for row in grid)
+
+def changed_areas(previous, frame):
+    # frame = (overlay, board, panel) state of a mode screen. Overlays are centered on the whole
+    # window, so a change there repaints everything, otherwise only the areas whose state changed
+    # are sent to the display. An unchanged frame is not drawn at all.
+    if previous is None or previous[0] != frame[0]:
+        return [window.get_rect()]
+    areas = []
+    if previous[1] != frame[1]:
+        areas.append(BOARD_AREA)
+    if previous[2] != frame[2]:
+        areas.append(PANEL_AREA)
+    return areas
+
+def progress_label(solver):
+    return f"Solving... {solver.running_time():.1f} seconds" if solver is not None else None
 
 buttons = [
     pygame.Rect((WIDTH - BUTTON_WIDTH) // 2, 100, BUTTON_WIDTH, BUTTON_HEIGHT),
@@ -61,16 +151,53 @@ difficulty_buttons = [
 
 difficulty_texts = ["Easy", "Moderate", "Hard"]
 selected_difficulty = None
+
+# Solver engine used by the AI modes, picked with the radio buttons above the mode buttons
+engine_texts = ["Bitmask", "Dancing Links", "Backtracking"]
+engine_names = ["bitmask", "dlx", "backtracking"]
+engine_buttons = [pygame.Rect((WIDTH - BUTTON_WIDTH) // 2 + j * (BUTTON_WIDTH // 3), 40, BUTTON_WIDTH // 3, 30) for j in range(3)]
+selected_engine = 0
+# Board size of Mode 1. Mode 2 and Mode 3 take single key presses as input and stay 9x9.
+size_texts = ["9x9", "16x16", "25x25"]
+board_sizes = [9, 16, 25]
+size_buttons = [pygame.Rect((WIDTH - BUTTON_WIDTH) // 2 + j * (BUTTON_WIDTH // 3), 740, BUTTON_WIDTH // 3, 30) for j in range(3)]
+selected_size = 0
+# Boards for Mode 1 / Mode 3 are served from a pool refilled in the background, kept in puzzle_pool/ between runs
+puzzle_pool = PuzzlePool(difficulty_texts, watermark=10, path="puzzle_pool")
+# Pools of larger boards are only started once their size is picked, they take seconds per puzzle
+puzzle_pools = {9: puzzle_pool}
+
+def get_puzzle_pool(size):
+    if size not in puzzle_pools:
+        pool = PuzzlePool(difficulty_texts, watermark=3, path=os.path.join("puzzle_pool", f"{size}x{size}"), size=size)
+        puzzle_pools[size] = pool.start()
+        atexit.register(pool.stop)
+    return puzzle_pools[size]
+# Solutions of boards solved before (up to symmetry), shared by all modes
+solution_cache = SolutionCache(maxsize=256)
 show_select_difficulty_message = False
     
 def draw_menu():
         window.blit(background_image, (0, 0))
         for i, button in enumerate(buttons):
             pygame.draw.rect(window, MENU_BUTTON_BACKGROUND, button, border_radius=10)
-            text = button_font.render(button_texts[i], True, BLACK)
+            text = render_text(button_texts[i], 30, BLACK)
             text_rect = text.get_rect(center=button.center)
             window.blit(text, text_rect)
             
+        size_label = render_text("Mode 1 board:", 30, BLACK)
+        window.blit(size_label, size_label.get_rect(midright=(size_buttons[0].x - 10, size_buttons[0].y + 15)))
+
+        for j, engine_button in enumerate(engine_buttons):
+            if selected_engine == j:
+                pygame.draw.circle(window, BLACK, (engine_button.x + 15, engine_button.y + 15), 10)
+            else:
+                pygame.draw.circle(window, WHITE, (engine_button.x + 15, engine_button.y + 15), 10)
+                pygame.draw.circle(window, BLACK, (engine_button.x + 15, engine_button.y + 15), 10, 1)
+            text = render_text(engine_texts[j], 30, BLACK)
+            text_rect = text.get_rect(midleft=(engine_button.x + 30, engine_button.y + 15))
+            window.blit(text, text_rect)
+
         for j, diff_button in enumerate(difficulty_buttons):
             
             diff_button.y = buttons[2].y + BUTTON_HEIGHT + 50 
@@ -80,14 +207,23 @@ def draw_menu():
             else:
                 pygame.draw.circle(window, WHITE, (diff_button.x + 15, diff_button.y + 15), 10)
                 pygame.draw.circle(window, BLACK, (diff_button.x + 15, diff_button.y + 15), 10, 1)
-            text = button_font.render(difficulty_texts[j], True, BLACK)
+            text = render_text(difficulty_texts[j], 30, BLACK)
             text_rect = text.get_rect(midleft=(diff_button.x + 30, diff_button.y + 15))
             window.blit(text, text_rect)
+
+            size_button = size_buttons[j]
+            if selected_size == j:
+                pygame.draw.circle(window, BLACK, (size_button.x + 15, size_button.y + 15), 10)
+            else:
+                pygame.draw.circle(window, WHITE, (size_button.x + 15, size_button.y + 15), 10)
+                pygame.draw.circle(window, BLACK, (size_button.x + 15, size_button.y + 15), 10, 1)
+            text = render_text(size_texts[j], 30, BLACK)
+            text_rect = text.get_rect(midleft=(size_button.x + 30, size_button.y + 15))
+            window.blit(text, text_rect)
             
             if show_select_difficulty_message:
                 message = "Please select a difficulty first!"
-                message_font = pygame.font.SysFont(None, 40)
-                message_text = message_font.render(message, True, ERROR)
+                message_text = render_text(message, 40, ERROR)
                 message_rect = message_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
                 window.blit(message_text, message_rect)
                 box_padding = 30
@@ -105,119 +241,187 @@ def count_filled_cells(grid):
     return sum(cell != 0 for row in grid for cell in row)
 
 def draw_sudoku_board(window, board):
-    for i in range(9):
-        for j in range(9):
-            cell_x = board_start_x + j * (cell_size + cell_margin)
-            cell_y = board_start_y + i * (cell_size + cell_margin)
-            pygame.draw.rect(window, WHITE, (cell_x, cell_y, cell_size, cell_size), border_radius=3)
-            pygame.draw.rect(window, (0, 0, 0), (cell_x, cell_y, cell_size, cell_size), 1)
-            
+    size = len(board)
+    background, cell_tiles, corner_tiles = get_board_surfaces(size)
+    cell, margin, _ = board_layout(size)
+    box = board_geometry(size).box
+    window.blit(background, (0, 0))
+    for i in range(size):
+        for j in range(size):
             if board[i][j] != 0:
-                pygame.draw.rect(window, GREY, (cell_x, cell_y, cell_size, cell_size), border_radius=3)
-                text_surface = number_font.render(str(board[i][j]), True, BUTTON_TEXT)
-                text_rect = text_surface.get_rect(center=(cell_x + cell_size / 2, cell_y + cell_size / 2))
-                window.blit(text_surface, text_rect)
-            if i % 3 == 0 and j % 3 == 0:
-                pygame.draw.rect(window, BLACK, (cell_x - cell_margin +3, cell_y - cell_margin+3, subgrid_size, subgrid_size), 7, border_radius=15)
+                cell_x = board_start_x + j * (cell + margin)
+                cell_y = board_start_y + i * (cell + margin)
+                tiles = corner_tiles if i % box == 0 and j % box == 0 else cell_tiles
+                window.blit(tiles[board[i][j]], (cell_x, cell_y))
+
+def cancel_solver(solver):
+    if solver is not None:
+        solver.cancel()
+        logging.info("Solving cancelled.")
+    return None
+
+def draw_solve_stats(window, elapsed_time, stats):
+    # Search statistics from the solver, or the plain solve time if none were reported
+    lines = stats.summary_lines() if stats is not None else [f"Game solved in {elapsed_time:.3f} seconds"]
+    for i, line in enumerate(lines):
+        stats_text = render_text(line, 30, BLACK)
+        window.blit(stats_text, (800, 450 - 30 * (len(lines) - 1 - i)))
+
+def draw_solving_progress(window, solver):
+    progress_text = render_text(progress_label(solver), 36, BLACK)
+    window.blit(progress_text, (800, 450))
 
 def mode1():
     mode1_agent = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Mode 1: AI Agent Solve Randomized Board")
-    puzzle = generate_random_puzzle(difficulty_texts[selected_difficulty])
+    size = board_sizes[selected_size]
+    pool = get_puzzle_pool(size)
+    # Only the bitmask and backtracking engines take boards larger than 9x9
+    engine = engine_names[selected_engine] if size == 9 or engine_names[selected_engine] != "dlx" else "bitmask"
+    # None until the pool has a board, a fresh 16x16 or 25x25 pool needs a few seconds for its first one
+    puzzle = pool.get(difficulty_texts[selected_difficulty], block=False)
+    empty_board = [[0] * size for _ in range(size)]
     elapsed_time = None
+    solve_stats = None
     mode1 = True
     error_message = None
+    solver = None
+    last_frame = None
     
     while mode1:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 mode1 = False
+                cancel_solver(solver)
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.VIDEOEXPOSE:
+                last_frame = None
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                # Check if solve button is clicked
+                # Check if solve button is clicked, it turns into a Cancel button while solving
                 if 850 <= event.pos[0] <= 1090 and 500 <= event.pos[1] <= 550:
-                    elapsed_time = None
-                    start = time.time()
-                    solved_puzzle = solve_sudoku(puzzle)
-                    end = time.time()
-                    
-                    if solved_puzzle is not None:
-                        elapsed_time = end - start
-                        print(f"Board solved in {elapsed_time:.5f} seconds.")
-                        logging.info(f"Board solved in {elapsed_time:.5f} seconds.")
-                        puzzle = solved_puzzle
-                        error_message = None 
-                    else:
-                        error_message = "The puzzle is unsolvable."
-                        logging.info("The puzzle is unsolvable.")
+                    if solver is not None:
+                        solver = cancel_solver(solver)
+                        error_message = "Solving cancelled."
+                    elif puzzle is not None:
+                        elapsed_time = None
+                        error_message = None
+                        solver = SolveWorker(puzzle, engine, solution_cache)
 
                 # Check if regenerate button is clicked
                 elif 850 <= event.pos[0] <= 1090 and 575 <= event.pos[1] <= 625:
+                    solver = cancel_solver(solver)
                     elapsed_time = None
-                    puzzle = generate_random_puzzle(difficulty_texts[selected_difficulty])
+                    puzzle = pool.get(difficulty_texts[selected_difficulty], block=False)
                     error_message = None 
                 # Check if back button is clicked
                 elif 850 <= event.pos[0] <= 1090 and 650 <= event.pos[1] <= 700:
+                    solver = cancel_solver(solver)
                     mode1 = False
 
+        # Boards are only ever generated by the pool's thread, keep asking until one is ready
+        if puzzle is None:
+            puzzle = pool.get(difficulty_texts[selected_difficulty], block=False)
+
+        # The solve runs in a worker process, pick up its result once it is done
+        if solver is not None and solver.poll():
+            if solver.solution is not None:
+                elapsed_time = solver.elapsed
+                solve_stats = solver.stats
+                print(f"Board solved in {elapsed_time:.5f} seconds.")
+                logging.info(f"Board solved in {elapsed_time:.5f} seconds.")
+                if solver.from_cache:
+                    logging.info(f"Solution served from cache ({solution_cache.hits} hits, {solution_cache.misses} misses)")
+                if solve_stats is not None:
+                    logging.info(f"Search statistics: {solve_stats}")
+                puzzle = solver.solution
+                error_message = None 
+            elif solver.error is not None:
+                error_message = f"The solver failed: {solver.error.splitlines()[-1]}"
+                print(f"The solver failed:\n{solver.error}")
+                logging.info(f"The solver failed:\n{solver.error}")
+            else:
+                error_message = "The puzzle is unsolvable."
+                logging.info("The puzzle is unsolvable.")
+            solver = None
+
+        # Only redraw when something on screen changed, at most FPS times a second
+        board = puzzle if puzzle is not None else empty_board
+        frame = ((error_message,), grid_state(board), (elapsed_time, solve_stats, progress_label(solver), puzzle is None))
+        areas = changed_areas(last_frame, frame)
+        clock.tick(FPS)
+        if not areas:
+            continue
+        last_frame = frame
+
         mode1_agent.fill(BACKGROUND)
-        draw_sudoku_board(mode1_agent, puzzle)
+        draw_sudoku_board(mode1_agent, board)
         
-        difficulty_font = pygame.font.SysFont(None, 50)
-        difficulty_text = difficulty_font.render(f"Difficulty: {difficulty_texts[selected_difficulty]}", True, BLACK)
+        difficulty_text = render_text(f"Difficulty: {difficulty_texts[selected_difficulty]}", 50, BLACK)
         mode1_agent.blit(difficulty_text, (850, 50))
         
-        min_cells, max_cells = get_filled_cells_range(difficulty_texts[selected_difficulty])
-        hint_font = pygame.font.SysFont(None, 30)
-        hint_text = hint_font.render(f"Entered between {min_cells} and {max_cells} cells", True, BLACK)
+        min_cells, max_cells = get_filled_cells_range(difficulty_texts[selected_difficulty], size)
+        hint_text = render_text(f"Entered between {min_cells} and {max_cells} cells", 30, BLACK)
         mode1_agent.blit(hint_text, (850, 100))
 
         if error_message:
-            error_font = pygame.font.SysFont(None, 36)
-            error_text = error_font.render(error_message, True, ERROR)
+            error_text = render_text(error_message, 36, ERROR)
             error_rect = error_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
             mode1_agent.blit(error_text, error_rect)
             
         if elapsed_time is not None:
-            time_font = pygame.font.SysFont(None, 36)
-            time_text = time_font.render(f"Game solved in {elapsed_time:.3f} seconds", True, (0, 0, 0))
-            mode1_agent.blit(time_text, (800, 450))
+            draw_solve_stats(mode1_agent, elapsed_time, solve_stats)
+        elif solver is not None:
+            draw_solving_progress(mode1_agent, solver)
+        elif puzzle is None:
+            generating_text = render_text("Generating board...", 36, BLACK)
+            mode1_agent.blit(generating_text, (800, 450))
 
         pygame.draw.rect(mode1_agent, BUTTON_BACKGROUND, (850, 500 - 5, 200, 50), border_radius=20)
         pygame.draw.rect(mode1_agent, BUTTON_BACKGROUND, (850, 575 - 5, 200, 50), border_radius=20)
         pygame.draw.rect(mode1_agent, BUTTON_BACKGROUND, (850, 650 - 5, 200, 50), border_radius=20)
-        button_font = pygame.font.SysFont(None, 30)
-        regenerate_text = button_font.render("Solve Board", True, BUTTON_TEXT)
-        solve_text = button_font.render("Randomize Board", True, BUTTON_TEXT)
+        regenerate_text = render_text("Cancel" if solver is not None else "Solve Board", 30, BUTTON_TEXT)
+        solve_text = render_text("Randomize Board", 30, BUTTON_TEXT)
         mode1_agent.blit(regenerate_text, (880, 510))
         mode1_agent.blit(solve_text, (860, 585))
-        back_text = button_font.render("Back to Menu", True, BUTTON_TEXT)
+        back_text = render_text("Back to Menu", 30, BUTTON_TEXT)
         mode1_agent.blit(back_text, (880, 655))
 
-        pygame.display.flip()
+        pygame.display.update(areas)
         
 def mode2():
     mode2_agent = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Mode 2: AI Agent Solve User Generate Board")
     elapsed_time = None
+    solve_stats = None
     puzzle = [[0 for _ in range(9)] for _ in range(9)]
     selected_cell = None
     mode2 = True
     error_message = None 
     invalid_key_message = None
+    solver = None
+    last_frame = None
     
     while mode2:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 mode2 = False
+                cancel_solver(solver)
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.VIDEOEXPOSE:
+                last_frame = None
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # Check if back button is clicked
                 if 850 <= event.pos[0] <= 1050 and 650 <= event.pos[1] <= 700:
+                    solver = cancel_solver(solver)
                     mode2 = False
                 elif 850 <= event.pos[0] <= 1050 and 500 <= event.pos[1] <= 550:
+                    if solver is not None:
+                        # The solve button is a Cancel button while the worker is searching
+                        solver = cancel_solver(solver)
+                        error_message = "Solving cancelled."
+                        continue
                     # Check if the puzzle is valid
                     elapsed_time = None
                     min_cells, max_cells = get_filled_cells_range(difficulty_texts[selected_difficulty])
@@ -225,23 +429,13 @@ def mode2():
                     if filled_cells < min_cells or filled_cells > max_cells:
                         error_message = f"Please enter between {min_cells} and {max_cells} cells for {difficulty_texts[selected_difficulty]} difficulty."
                     elif is_valid_sudoku(puzzle):   # solve
-                        start = time.time()
-                        solved_puzzle = solve_sudoku(puzzle)
-                        end = time.time()
-                        if solved_puzzle is not None:
-                            elapsed_time = end - start
-                            print(f"Board solved in {elapsed_time:.5f} seconds.")
-                            logging.info(f"Board solved in {elapsed_time:.5f} seconds.")
-                            
-                            puzzle = solved_puzzle
-                            error_message = None
-                        else:
-                            error_message = "The puzzle is unsolvable."
-                            logging.info("The puzzle is unsolvable.")
+                        error_message = None
+                        solver = SolveWorker(puzzle, engine_names[selected_engine], solution_cache)
                     else:
                         error_message = "Invalid Sudoku Input. Please Check Game Constraints"
                 elif 850 <= event.pos[0] <= 1050 and 575 <= event.pos[1] <= 625:
                     # Reset the puzzle when "Reset Board" button is clicked
+                    solver = cancel_solver(solver)
                     elapsed_time = None
                     puzzle = [[0 for _ in range(9)] for _ in range(9)]
                     error_message = None 
@@ -268,16 +462,44 @@ def mode2():
                         print(f"Invalid key pressed")
                         invalid_key_message = "Invalid key pressed. Please press a number key (1-9) or Backspace/Delete to clear the cell."    
 
+        if solver is not None and solver.poll():
+            if solver.solution is not None:
+                elapsed_time = solver.elapsed
+                solve_stats = solver.stats
+                print(f"Board solved in {elapsed_time:.5f} seconds.")
+                logging.info(f"Board solved in {elapsed_time:.5f} seconds.")
+                if solver.from_cache:
+                    logging.info(f"Solution served from cache ({solution_cache.hits} hits, {solution_cache.misses} misses)")
+                if solve_stats is not None:
+                    logging.info(f"Search statistics: {solve_stats}")
+                
+                puzzle = solver.solution
+                error_message = None
+            elif solver.error is not None:
+                error_message = f"The solver failed: {solver.error.splitlines()[-1]}"
+                print(f"The solver failed:\n{solver.error}")
+                logging.info(f"The solver failed:\n{solver.error}")
+            else:
+                error_message = "The puzzle is unsolvable."
+                logging.info("The puzzle is unsolvable.")
+            solver = None
+
+        frame = ((error_message, invalid_key_message), (grid_state(puzzle), selected_cell),
+                 (elapsed_time, solve_stats, progress_label(solver)))
+        areas = changed_areas(last_frame, frame)
+        clock.tick(FPS)
+        if not areas:
+            continue
+        last_frame = frame
+
         mode2_agent.fill(BACKGROUND)
         draw_sudoku_board(mode2_agent, puzzle)
         
-        difficulty_font = pygame.font.SysFont(None, 50)
-        difficulty_text = difficulty_font.render(f"Difficulty: {difficulty_texts[selected_difficulty]}", True, BLACK)
+        difficulty_text = render_text(f"Difficulty: {difficulty_texts[selected_difficulty]}", 50, BLACK)
         mode2_agent.blit(difficulty_text, (850, 50))
         
         min_cells, max_cells = get_filled_cells_range(difficulty_texts[selected_difficulty])
-        hint_font = pygame.font.SysFont(None, 30)
-        hint_text = hint_font.render(f"Enter between {min_cells} and {max_cells} cells", True, BLACK)
+        hint_text = render_text(f"Enter between {min_cells} and {max_cells} cells", 30, BLACK)
         mode2_agent.blit(hint_text, (850, 100))
 
         if selected_cell is not None:
@@ -285,8 +507,7 @@ def mode2():
             pygame.draw.rect(mode2_agent, SELECTED_CELL_COLOR, (cell_x * 80 + 12, cell_y * 80 + 12, 73, 73), 5, border_radius=10)
             
         if invalid_key_message:
-            invalid_key_font = pygame.font.SysFont(None, 30)
-            invalid_key_text = invalid_key_font.render(invalid_key_message, True, ERROR)
+            invalid_key_text = render_text(invalid_key_message, 30, ERROR)
             invalid_key_rect = invalid_key_text.get_rect(center=(WIDTH // 2, HEIGHT - 30))  
             box_padding = 20
             box_rect = pygame.Rect(
@@ -300,8 +521,7 @@ def mode2():
             mode2_agent.blit(invalid_key_text, invalid_key_rect)
             
         if error_message:
-            error_font = pygame.font.SysFont(None, 50)
-            error_text = error_font.render(error_message, True, ERROR)
+            error_text = render_text(error_message, 50, ERROR)
             error_rect = error_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
             mode2_agent.blit(error_text, error_rect)            
             box_padding = 50
@@ -316,72 +536,72 @@ def mode2():
             mode2_agent.blit(error_text, error_rect)
             
         if elapsed_time is not None:
-            time_font = pygame.font.SysFont(None, 36)
-            time_text = time_font.render(f"Game solved in {elapsed_time:.3f} seconds", True, BLACK)
-            mode2_agent.blit(time_text, (800, 450))
+            draw_solve_stats(mode2_agent, elapsed_time, solve_stats)
+        elif solver is not None:
+            draw_solving_progress(mode2_agent, solver)
 
         pygame.draw.rect(mode2_agent, BUTTON_BACKGROUND, (850, 500, 200, 50), border_radius=20)
         pygame.draw.rect(mode2_agent, BUTTON_BACKGROUND, (850, 575, 200, 50), border_radius=20)
         pygame.draw.rect(mode2_agent, BUTTON_BACKGROUND, (850, 650, 200, 50), border_radius=20)  
 
-        button_font = pygame.font.SysFont(None, 30)
-        solve_text = button_font.render("Solve Board", True, BUTTON_TEXT)
+        solve_text = render_text("Cancel" if solver is not None else "Solve Board", 30, BUTTON_TEXT)
         mode2_agent.blit(solve_text, (880, 510))
-        reset_text = button_font.render("Reset Board", True, BUTTON_TEXT)
+        reset_text = render_text("Reset Board", 30, BUTTON_TEXT)
         mode2_agent.blit(reset_text, (880, 585))
-        back_text = button_font.render("Back to Menu", True, BUTTON_TEXT)
+        back_text = render_text("Back to Menu", 30, BUTTON_TEXT)
         mode2_agent.blit(back_text, (880, 660))
 
-        pygame.display.flip()
+        pygame.display.update(areas)
     return puzzle
 
-def highlight_conflicts(mode3_agent, user_input_grid, solved_puzzle):
+def find_wrong_cells(user_input_grid, solved_puzzle):
+    # Full scan, only needed when a new solution arrives. Edits update the set one cell at a time.
+    return {(y, x) for y in range(9) for x in range(9)
+            if user_input_grid[y][x] != 0 and user_input_grid[y][x] != solved_puzzle[y][x]}
+
+def find_conflicts(counters, user_input_grid, wrong_cells):
+    # Cells to outline and messages for every wrong input. A row, column or box is only scanned
+    # for clashing cells when its counter says the digit appears more than once.
+    cells = []
     conflict_messages = []
-    for y in range(9):
-        for x in range(9):
-            if user_input_grid[y][x] != 0 and user_input_grid[y][x] != solved_puzzle[y][x]:
-                # Highlight the incorrect cell
-                pygame.draw.rect(mode3_agent, ERROR, (x * 80 + 12, y * 80 + 12, 72, 72), 5, border_radius=10)
-                conflict_message = f"Input at Column ({x+1}), Row ({y+1}) is incorrect"
-                conflict_messages.append(conflict_message)
-                logging.info(conflict_message)
-                print(conflict_message)
-
-                # Highlight the conflicting row
-                for col in range(9):
-                    if user_input_grid[y][col] == user_input_grid[y][x] and col != x:
-                        pygame.draw.rect(mode3_agent, ERROR, (col * 80 + 12, y * 80 + 12, 72, 72), 5, border_radius=10)
-                        conflict_message = f"Conflict with cell at Column ({col+1}), Row ({y+1})"
-                        conflict_messages.append(conflict_message)
-                        logging.info(conflict_message)
-                        print(conflict_message)
-
-                # Highlight the conflicting column
-                for row in range(9):
-                    if user_input_grid[row][x] == user_input_grid[y][x] and row != y:
-                        pygame.draw.rect(mode3_agent, ERROR, (x * 80 + 12, row * 80 + 12, 72, 72), 5, border_radius=10)
-                        conflict_message = f"Conflict with cell at Column ({x+1}), Row ({row+1})"
-                        conflict_messages.append(conflict_message)
-                        logging.info(conflict_message)
-                        print(conflict_message)
-
-                # Highlight the conflicting subgrid
-                subgrid_row, subgrid_col = 3 * (y // 3), 3 * (x // 3)
-                for row in range(subgrid_row, subgrid_row + 3):
-                    for col in range(subgrid_col, subgrid_col + 3):
-                        if user_input_grid[row][col] == user_input_grid[y][x] and (row, col) != (y, x):
-                            pygame.draw.rect(mode3_agent, ERROR, (col * 80 + 12, row * 80 + 12, 72, 72), 5, border_radius=10)
-                            conflict_message = f"Conflict with cell ({col+1}), Row ({row+1}) in same subgrid"
-                            conflict_messages.append(conflict_message)
-                            logging.info(conflict_message)
-                            print(conflict_message)
+    for y, x in sorted(wrong_cells):
+        num = user_input_grid[y][x]
+        row_unit, col_unit, box_unit = UNITS_OF[y * 9 + x]
+        cells.append((y, x))
+        conflict_messages.append(f"Input at Column ({x+1}), Row ({y+1}) is incorrect")
+        if counters.count(row_unit, num) > 1:
+            for row, col in ROW_CELLS[y]:
+                if user_input_grid[row][col] == num and col != x:
+                    cells.append((row, col))
+                    conflict_messages.append(f"Conflict with cell at Column ({col+1}), Row ({row+1})")
+        if counters.count(col_unit, num) > 1:
+            for row, col in COL_CELLS[x]:
+                if user_input_grid[row][col] == num and row != y:
+                    cells.append((row, col))
+                    conflict_messages.append(f"Conflict with cell at Column ({col+1}), Row ({row+1})")
+        if counters.count(box_unit, num) > 1:
+            for row, col in BOX_CELLS[box_unit - 18]:
+                if user_input_grid[row][col] == num and (row, col) != (y, x):
+                    cells.append((row, col))
+                    conflict_messages.append(f"Conflict with cell ({col+1}), Row ({row+1}) in same subgrid")
+    return cells, conflict_messages
+
+def log_new_conflicts(conflict_messages, previous_messages):
+    # Only conflicts that were not reported for the previous board state are printed and logged
+    for conflict_message in conflict_messages:
+        if conflict_message not in previous_messages:
+            logging.info(conflict_message)
+            print(conflict_message)
+
+def highlight_conflicts(mode3_agent, cells, conflict_messages):
+    for y, x in cells:
+        pygame.draw.rect(mode3_agent, ERROR, (x * 80 + 12, y * 80 + 12, 72, 72), 5, border_radius=10)
 
     # Display conflict messages on the window
     if conflict_messages:
-        font = pygame.font.SysFont(None, 30)
         y_offset = 250
         for message in conflict_messages:
-            text_surface = font.render(message, True, ERROR)
+            text_surface = render_text(message, 30, ERROR)
             text_rect = text_surface.get_rect(center=(WIDTH // 2 + 340, y_offset))
             box_padding = 20
             box_rect = pygame.Rect(
@@ -398,26 +618,41 @@ def highlight_conflicts(mode3_agent, user_input_grid, solved_puzzle):
 def mode3():
     mode3_agent = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Mode 3: User Solve User Generate Board")
-    puzzle = generate_random_puzzle(difficulty_texts[selected_difficulty])
+    puzzle = puzzle_pool.get(difficulty_texts[selected_difficulty])
     selected_cell = None
     solved_puzzle = None
     user_input_grid = copy.deepcopy(puzzle)
     initial_grid = copy.deepcopy(puzzle)
+    # Unit digit counters and the wrong inputs are updated per edit, conflicts are recomputed only then
+    counters = UnitCounters(user_input_grid)
+    wrong_cells = set()
+    conflict_cells, conflict_messages = [], []
     mode3 = True
     error_message = None
     invalid_key_message = None
+    solver = None
+    last_frame = None
     
     while mode3:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 mode3 = False
+                cancel_solver(solver)
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.VIDEOEXPOSE:
+                last_frame = None
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # Check if back button is clicked
                 if 850 <= event.pos[0] <= 1050 and 650 <= event.pos[1] <= 700:
+                    solver = cancel_solver(solver)
                     mode3 = False
                 elif 850 <= event.pos[0] <= 1050 and 500 <= event.pos[1] <= 550:
+                    if solver is not None:
+                        # The solve button is a Cancel button while the worker is searching
+                        solver = cancel_solver(solver)
+                        error_message = "Solving cancelled."
+                        continue
                     # Solve the puzzle and store the solution
                     elapsed_time = None
                     min_cells, max_cells = get_filled_cells_range(difficulty_texts[selected_difficulty])
@@ -428,26 +663,21 @@ def mode3():
                         error_message = f"Please enter between {min_cells} and {max_cells} cells for {difficulty_texts[selected_difficulty]} difficulty."
                     elif is_valid_sudoku(user_input_grid):
                         # Solve the puzzle when "Solve Board" button is clicked
-                        start = time.time()
-                        solved_puzzle = solve_sudoku(user_input_grid)
-                        end = time.time()
-                        if solved_puzzle is not None:
-                            elapsed_time = end - start
-                            print(f"Board solved in {elapsed_time:.5f} seconds.")
-                            logging.info(f"Board solved in {elapsed_time:.5f} seconds.")
-                            puzzle = solved_puzzle
-                            error_message = None
-                        else:
-                            error_message = "The puzzle is unsolvable."
-                            logging.info("The puzzle is unsolvable.")
+                        error_message = None
+                        solver = SolveWorker(user_input_grid, engine_names[selected_engine], solution_cache)
                     else:
                         error_message = "Invalid Sudoku Input. Please Check Game Constraints"
                 # Check if regenerate button is clicked
                 elif 850 <= event.pos[0] <= 1090 and 575 <= event.pos[1] <= 625:
+                    solver = cancel_solver(solver)
                     elapsed_time = None
-                    puzzle = generate_random_puzzle(difficulty_texts[selected_difficulty])
+                    puzzle = puzzle_pool.get(difficulty_texts[selected_difficulty])
                     user_input_grid = copy.deepcopy(puzzle)
                     initial_grid = copy.deepcopy(puzzle)
+                    counters = UnitCounters(user_input_grid)
+                    solved_puzzle = None
+                    wrong_cells = set()
+                    conflict_cells, conflict_messages = [], []
                     error_message = None 
                 else:
                     # Get the clicked cell position
@@ -461,39 +691,81 @@ def mode3():
             elif event.type == pygame.KEYDOWN:
                 if selected_cell is not None:
                     invalid_key_message = None
+                    new_value = None
                     if initial_grid[selected_cell[1]][selected_cell[0]] == 0:
                     # Check if a number key (1-9) is pressed
                         if pygame.K_1 <= event.key <= pygame.K_9:
-                            user_input_grid[selected_cell[1]][selected_cell[0]] = int(event.unicode)
+                            new_value = int(event.unicode)
                         elif event.key == pygame.K_DELETE or event.key == pygame.K_BACKSPACE:
-                            user_input_grid[selected_cell[1]][selected_cell[0]] = 0
+                            new_value = 0
                         else:
                             print(f"Invalid key pressed")
                             invalid_key_message = "Invalid key pressed. Please press a number key (1-9) or Backspace/Delete to clear the cell."
-                            
-                if is_board_complete(user_input_grid):
-                    solved_puzzle = solve_sudoku(user_input_grid)
-                    if solved_puzzle is None:
-                        error_message = "The puzzle is unsolvable."
-                        logging.info("The puzzle is unsolvable.")
-                    else:
-                        error_message = "Congratulations! You have successfully solved the puzzle."
-                        logging.info("Congratulations! You have successfully solved the puzzle.")
+
+                    cell_x, cell_y = selected_cell
+                    if new_value is not None and counters.set(cell_y, cell_x, new_value):
+                        user_input_grid[cell_y][cell_x] = new_value
+                        if solved_puzzle is not None and new_value != 0 and new_value != solved_puzzle[cell_y][cell_x]:
+                            wrong_cells.add((cell_y, cell_x))
+                        else:
+                            wrong_cells.discard((cell_y, cell_x))
+
+                        if counters.is_complete():
+                            # A full board without duplicates that kept the givens is a solution of the
+                            # puzzle, so the key handler needs no solve to confirm it
+                            solved_puzzle = copy.deepcopy(user_input_grid)
+                            error_message = "Congratulations! You have successfully solved the puzzle."
+                            logging.info("Congratulations! You have successfully solved the puzzle.")
+                            wrong_cells = set()
+                        new_cells, new_messages = find_conflicts(counters, user_input_grid, wrong_cells)
+                        log_new_conflicts(new_messages, conflict_messages)
+                        conflict_cells, conflict_messages = new_cells, new_messages
+
+        if solver is not None and solver.poll():
+            if solver.solution is not None:
+                elapsed_time = solver.elapsed
+                print(f"Board solved in {elapsed_time:.5f} seconds.")
+                logging.info(f"Board solved in {elapsed_time:.5f} seconds.")
+                if solver.from_cache:
+                    logging.info(f"Solution served from cache ({solution_cache.hits} hits, {solution_cache.misses} misses)")
+                solved_puzzle = solver.solution
+                puzzle = solved_puzzle
+                error_message = None
+                wrong_cells = find_wrong_cells(user_input_grid, solved_puzzle)
+                new_cells, new_messages = find_conflicts(counters, user_input_grid, wrong_cells)
+                log_new_conflicts(new_messages, conflict_messages)
+                conflict_cells, conflict_messages = new_cells, new_messages
+            elif solver.error is not None:
+                error_message = f"The solver failed: {solver.error.splitlines()[-1]}"
+                print(f"The solver failed:\n{solver.error}")
+                logging.info(f"The solver failed:\n{solver.error}")
+            else:
+                error_message = "The puzzle is unsolvable."
+                logging.info("The puzzle is unsolvable.")
+            solver = None
                         
+        # Conflict messages are drawn next to the board and may reach into it, they count as overlay
+        highlighted = solved_puzzle is not None
+        frame = ((error_message, invalid_key_message, highlighted and tuple(conflict_messages)),
+                 (grid_state(user_input_grid), selected_cell, highlighted and tuple(conflict_cells)),
+                 (progress_label(solver),))
+        areas = changed_areas(last_frame, frame)
+        clock.tick(FPS)
+        if not areas:
+            continue
+        last_frame = frame
+
         mode3_agent.fill(BACKGROUND)
         draw_sudoku_board(mode3_agent, user_input_grid)
 
-        difficulty_font = pygame.font.SysFont(None, 50)
-        difficulty_text = difficulty_font.render(f"Difficulty: {difficulty_texts[selected_difficulty]}", True, BLACK)
+        difficulty_text = render_text(f"Difficulty: {difficulty_texts[selected_difficulty]}", 50, BLACK)
         mode3_agent.blit(difficulty_text, (850, 50))
         
         min_cells, max_cells = get_filled_cells_range(difficulty_texts[selected_difficulty])
-        hint_font = pygame.font.SysFont(None, 30)
-        hint_text = hint_font.render(f"Enter between {min_cells} and {max_cells} cells", True, BLACK)
+        hint_text = render_text(f"Enter between {min_cells} and {max_cells} cells", 30, BLACK)
         mode3_agent.blit(hint_text, (850, 100))
         
-        Instructions_font = pygame.font.SysFont(None, 30)
-        Instructions_text = Instructions_font.render("Click on (Start Solve Board) to start playing ..", True, BLACK)
+        Instructions_text = render_text("Click on (Start Solve Board) to start playing ..", 30, BLACK)
         mode3_agent.blit(Instructions_text, (800, 150))
         
         if selected_cell is not None:
@@ -501,8 +773,7 @@ def mode3():
             pygame.draw.rect(mode3_agent, SELECTED_CELL_COLOR, (cell_x * 80 + 12, cell_y * 80 + 12, 72, 72), 5, border_radius=10)
             
         if invalid_key_message:
-            invalid_key_font = pygame.font.SysFont(None, 30)
-            invalid_key_text = invalid_key_font.render(invalid_key_message, True, ERROR)
+            invalid_key_text = render_text(invalid_key_message, 30, ERROR)
             invalid_key_rect = invalid_key_text.get_rect(center=(WIDTH // 2, HEIGHT - 30))  
             box_padding = 20
             box_rect = pygame.Rect(
@@ -516,8 +787,7 @@ def mode3():
             mode3_agent.blit(invalid_key_text, invalid_key_rect)
             
         if error_message:
-            error_font = pygame.font.SysFont(None, 50)
-            error_text = error_font.render(error_message, True, ERROR)
+            error_text = render_text(error_message, 50, ERROR)
             error_rect = error_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
             mode3_agent.blit(error_text, error_rect)            
             box_padding = 50
@@ -534,20 +804,21 @@ def mode3():
             
         # Compare user input with solver's solution in real-time
         if solved_puzzle is not None:
-            highlight_conflicts(mode3_agent, user_input_grid, solved_puzzle)
+            highlight_conflicts(mode3_agent, conflict_cells, conflict_messages)
+        elif solver is not None:
+            draw_solving_progress(mode3_agent, solver)
 
         pygame.draw.rect(mode3_agent, BUTTON_BACKGROUND, (850, 500, 200, 50), border_radius=20)
         pygame.draw.rect(mode3_agent, BUTTON_BACKGROUND, (850, 575, 200, 50), border_radius=20)
         pygame.draw.rect(mode3_agent, BUTTON_BACKGROUND, (850, 650, 200, 50), border_radius=20)  
-        button_font = pygame.font.SysFont(None, 30)
-        solve_text = button_font.render("Start Solve Board", True, BUTTON_TEXT)
+        solve_text = render_text("Cancel" if solver is not None else "Start Solve Board", 30, BUTTON_TEXT)
         mode3_agent.blit(solve_text, (860, 510))
-        reset_text = button_font.render("Randomize Board", True, BUTTON_TEXT)
+        reset_text = render_text("Randomize Board", 30, BUTTON_TEXT)
         mode3_agent.blit(reset_text, (866, 585))
-        back_text = button_font.render("Back to Menu", True, BUTTON_TEXT)
+        back_text = render_text("Back to Menu", 30, BUTTON_TEXT)
         mode3_agent.blit(back_text, (880, 660))
 
-        pygame.display.flip()
+        pygame.display.update(areas)
     return user_input_grid
 
 def main():
@@ -555,13 +826,18 @@ def main():
     mode2_option = False  
     mode3_option = False  
     running = True
-    global selected_difficulty, show_select_difficulty_message
+    global selected_difficulty, selected_engine, selected_size, show_select_difficulty_message
+    puzzle_pool.start()
+    atexit.register(puzzle_pool.stop)
+    last_menu = None
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.VIDEOEXPOSE:
+                last_menu = None
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 for i, button in enumerate(buttons):
                     if button.collidepoint(event.pos):
@@ -587,27 +863,47 @@ def main():
                         logging.info("Selected Difficulty: " + difficulty_texts[selected_difficulty])
                         logging.info("=====================================\n") 
                         show_select_difficulty_message = False
-
-        draw_menu()
-        pygame.display.flip()
+                for j, button in enumerate(engine_buttons):
+                    if button.collidepoint(event.pos):
+                        selected_engine = j
+                        logging.info("Selected Solver: " + engine_texts[selected_engine])
+                        logging.info("=====================================\n")
+                for j, button in enumerate(size_buttons):
+                    if button.collidepoint(event.pos):
+                        selected_size = j
+                        # Start filling the pool right away, Mode 1 takes its boards from it
+                        get_puzzle_pool(board_sizes[selected_size])
+                        logging.info("Selected Board Size: " + size_texts[selected_size])
+                        logging.info("=====================================\n")
+
+        # The menu is static between clicks, it is only redrawn when a selection changed
+        menu = (selected_difficulty, selected_engine, selected_size, show_select_difficulty_message)
+        if menu != last_menu:
+            draw_menu()
+            pygame.display.flip()
+            last_menu = menu
+        clock.tick(FPS)
         
         if mode1_option:
             logging.info("Mode 1: AI Agent Solve Randomized Board")
             logging.info("=====================================\n")             
             mode1_option = False 
-            mode1()  
+            mode1()
+            last_menu = None
 
         if mode2_option:
             logging.info("Mode 2: AI Agent Solve User Generate Board")
             logging.info("=====================================\n")
             mode2_option = False  
-            mode2()  
+            mode2()
+            last_menu = None
 
         if mode3_option:
             logging.info("Mode 3: User Solve User Generate Board")
             logging.info("=====================================\n")
             mode3_option = False 
-            mode3()  
+            mode3()
+            last_menu = None
     pygame.quit()
 
 if __name__ == "__main__":
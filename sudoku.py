@@ -1,15 +1,27 @@
-import numpy as np
 import logging
 import copy
-from sudoku_utils import get_filled_cells_range, is_valid_move, is_empty_cell
+import random
+import time
+from collections import deque
+from sudoku_utils import get_filled_cells_range, is_valid_move, is_empty_cell, board_geometry
+from sudoku_bitmask import solve_with_bitmask, count_solutions, VALUE_ORDERS
+from sudoku_dlx import solve_with_dlx
+from sudoku_rating import rate_puzzle, SCORES, TRIAL_AND_ERROR
+from sudoku_trace import (NULL_TRACE, TRY_CELL, TRY_VALUE, APPLY_AC, AC_OK, CONFLICT, INVALID_VALUE,
+                          DEAD_END, PROCESS_CELL, REVISE)
 
-logging.basicConfig(filename='sudoku_agent.log', level=logging.INFO, format='%(message)s', filemode='w')
-
-def backtracking(board, domains=None):
+def backtracking(board, domains=None, trace=NULL_TRACE, stats=None, depth=0, order="lcv", singles=False):
 
     if domains is None:
-        domains, steps = apply_arc_consistency(board)
+        domains, steps = apply_arc_consistency(board, trace=trace, stats=stats, singles=singles)
+        if domains is None:   # The givens already leave some cell without a value
+            return False
+    if stats is not None:
+        stats.max_depth = max(stats.max_depth, depth)
+        start = time.perf_counter()
     mrv_cell = is_empty_cell(board, domains)  # Find mrv cell with min remaining values in domain.
+    if stats is not None:
+        stats.mrv_time += time.perf_counter() - start
     
     if mrv_cell is None:   # If no mrv cell is found, the board is solved.
         return True
@@ -19,69 +31,105 @@ def backtracking(board, domains=None):
 
     domain_values = domains[row][col]
 
-    # we re-order by least constrained value of domain of mrv
-    domain_values.sort(key=lambda num: count_constrained_values(board, row, col, num))
+    # we re-order by least constrained value of domain of mrv, or keep natural / random order
+    if stats is not None:
+        start = time.perf_counter()
+    if order == "lcv":
+        domain_values.sort(key=lambda num: count_domain_support(domains, row, col, num))
+    elif order == "random":
+        random.shuffle(domain_values)
+    if stats is not None:
+        stats.lcv_time += time.perf_counter() - start
 
     # print(f"Attempting to fill cell ({row}, {col}) with domain values: {domain_values}")
-    logging.info(f"Attempting to fill cell ({row}, {col}) with domain values: {domain_values}")
+    if trace.enabled:
+        trace.emit(TRY_CELL, row, col, list(domain_values))
 
     for num in domain_values:
         # print(f"Trying value {num} for cell ({row}, {col})")
-        logging.info(f"Trying value {num} for cell ({row}, {col})")
+        if trace.enabled:
+            trace.emit(TRY_VALUE, row, col, num)
         if is_valid_move(board, row, col, num):
             board[row][col] = num
+            if stats is not None:
+                stats.nodes += 1
             # print("Applying Arc Consistency")
-            logging.info("Applying Arc Consistency")
+            if trace.enabled:
+                trace.emit(APPLY_AC)
 
             # first returned value is domains, it's None if a var domain became empty
-            new_domains, steps = apply_arc_consistency(board, domains)
+            if stats is not None:
+                start = time.perf_counter()
+            new_domains, steps = apply_arc_consistency(board, domains, trace, stats, singles)
+            if stats is not None:
+                stats.propagation_time += time.perf_counter() - start
             if new_domains is not None:
                 # print("Arc Consistency check is successful")
-                logging.info("Arc Consistency check is successful")
+                if trace.enabled:
+                    trace.emit(AC_OK)
 
                 # Recursive call to fill the next cell --> DFS way
-                if backtracking(board, new_domains):
+                if backtracking(board, new_domains, trace, stats, depth + 1, order, singles):
                     return True
 
             # print(f"Value {num} for cell ({row}, {col}) leads to conflict. Backtracking...")
-            logging.info(f"Value {num} for cell ({row}, {col}) leads to conflict. Backtracking...")
+            if trace.enabled:
+                trace.emit(CONFLICT, row, col, num)
+            if stats is not None:
+                stats.backtracks += 1
             board[row][col] = 0
         else:
             # print(f"Value {num} is not valid for cell ({row}, {col}). Skipping...")
-            logging.info(f"Value {num} is not valid for cell ({row}, {col}). Skipping...") 
+            if trace.enabled:
+                trace.emit(INVALID_VALUE, row, col, num)
 
     # print(f"No valid value found for cell ({row}, {col}). Backtracking...")
-    logging.info(f"No valid value found for cell ({row}, {col}). Backtracking...")
+    if trace.enabled:
+        trace.emit(DEAD_END, row, col)
     return False
 
 def get_domain_values(board, row, col):
-    domain_values = [num for num in range(1, 10) if is_valid_move(board, row, col, num)]
+    domain_values = [num for num in range(1, len(board) + 1) if is_valid_move(board, row, col, num)]
     return domain_values
 
 def count_constrained_values(board, row, col, num):
     count = 0
-    for i in range(9):
-        if i != col and not is_valid_move(board, row, i, num): # check for violation in row
+    size = len(board)
+    for i, j in board_geometry(size).peer_cells[row * size + col]:  # check for violation in row, column and box
+        if not is_valid_move(board, i, j, num):
             count += 1
-        if i != row and not is_valid_move(board, i, col, num): # check for violation in column
+    return count
+ 
+def count_domain_support(domains, row, col, num):
+    # LCV from the maintained domains: how many peers still have num in their domain and would lose it
+    count = 0
+    size = len(domains)
+    for i, j in board_geometry(size).peer_cells[row * size + col]:
+        if num in domains[i][j]:
             count += 1
-    for i in range(row - row % 3, row - row % 3 + 3):  # check for violation in 3x3
-        for j in range(col - col % 3, col - col % 3 + 3):
-            if (i != row or j != col) and not is_valid_move(board, i, j, num):
-                count += 1
     return count
  
-def apply_arc_consistency(board, parent_domains=None):
-    queue = []
+def apply_arc_consistency(board, parent_domains=None, trace=NULL_TRACE, stats=None, singles=False):
+    # AC-3 over the all-different arcs. A value can only lose support from a peer whose domain is a
+    # single value, so only cells that just became singletons are queued, and each at most once at a time.
+    # With singles=True, hidden singles (a value with one possible cell left in a row, column or box) are placed too.
+    # Returns (domains, steps), domains is None on a wipeout. steps lists the revisions only while trace
+    # is enabled and stays empty otherwise, the same data goes to the trace as REVISE events.
+    queue = deque()
+    in_queue = set()
+    size = len(board)
+    geometry = board_geometry(size)
     # Initialize domains with all possible values
-    domains = copy.deepcopy(parent_domains) if parent_domains is not None else [[list(range(1, 10)) for _ in range(9)] for _ in range(9)]
+    domains = copy.deepcopy(parent_domains) if parent_domains is not None else [[list(range(1, size + 1)) for _ in range(size)] for _ in range(size)]
     steps = []  # List to store the steps of arc consistency
 
-    for i in range(9):
-        for j in range(9):
-            if board[i][j] != 0:
+    for i in range(size):
+        for j in range(size):
+            # Cells that already were singletons in the parent domains have been propagated there
+            if board[i][j] != 0 and (parent_domains is None or domains[i][j] != [board[i][j]]):
                 domains[i][j] = [board[i][j]]
-                queue.append((i, j))   
+                queue.append((i, j))
+                in_queue.add((i, j))
 
     def revise(xi, xj):
         revised = False
@@ -92,76 +140,217 @@ def apply_arc_consistency(board, parent_domains=None):
                 removed_values.append(value)
                 revised = True
         if revised:
-            steps.append(((xi[0], xi[1]), (xj[0], xj[1]), removed_values))
+            if stats is not None:
+                stats.revisions += 1
             # print(f"Revised: {removed_values} removed from ({xi[0]}, {xi[1]})'s domain due to ({xj[0]}, {xj[1]})")
-            logging.info(f"Revised: The values, {removed_values}, are removed from ({xi[0]}, {xi[1]})'s domain the value due to ({xj[0]}, {xj[1]})")
+            if trace.enabled:
+                steps.append(((xi[0], xi[1]), (xj[0], xj[1]), removed_values))
+                trace.emit(REVISE, xi[0], xi[1], removed_values, xj[0], xj[1])
         return revised
 
-    while queue:
-        xi, xj = queue.pop(0)
-        # print(f"Processing cell ({xi}, {xj})")
-        logging.info("=====================================================")
-        logging.info(f"Processing cell ({xi}, {xj})")
-        for i in range(9):
-            if i != xi and revise((i, xj), (xi, xj)):
-                if len(domains[i][xj]) == 0:
-                    return None, steps
-                queue.append((i, xj))
-        for j in range(9):
-            if j != xj and revise((xi, j), (xi, xj)):
-                if len(domains[xi][j]) == 0:
-                    return None, steps
-                queue.append((xi, j))
-
-        subgrid_row_start = (xi // 3) * 3
-        subgrid_col_start = (xj // 3) * 3
-        for i in range(subgrid_row_start, subgrid_row_start + 3):
-            for j in range(subgrid_col_start, subgrid_col_start + 3):
-                if (i != xi or j != xj) and revise((i, j), (xi, xj)):
+    def hidden_singles():
+        # Returns False if some value has no possible cell left in a unit
+        for unit in geometry.unit_cells:
+            places = {}
+            for i, j in unit:
+                for value in domains[i][j]:
+                    places.setdefault(value, []).append((i, j))
+            if len(places) < size:
+                return False
+            for value, cells in places.items():
+                i, j = cells[0]
+                if len(cells) == 1 and len(domains[i][j]) > 1:
+                    domains[i][j] = [value]
+                    if (i, j) not in in_queue:
+                        queue.append((i, j))
+                        in_queue.add((i, j))
+        return True
+
+    while True:
+        while queue:
+            xi, xj = queue.popleft()
+            in_queue.discard((xi, xj))
+            if stats is not None:
+                stats.propagations += 1
+            # print(f"Processing cell ({xi}, {xj})")
+            if trace.enabled:
+                trace.emit(PROCESS_CELL, xi, xj)
+            for i, j in geometry.peer_cells[xi * size + xj]:
+                if revise((i, j), (xi, xj)):
                     if len(domains[i][j]) == 0:
                         return None, steps
-                    queue.append((i, j))
+                    if len(domains[i][j]) == 1 and (i, j) not in in_queue:
+                        queue.append((i, j))
+                        in_queue.add((i, j))
+        if not singles:
+            break
+        if not hidden_singles():
+            return None, steps
+        if not queue:
+            break
 
     return domains, steps
 
-## OLD IMPLEMENTATION
-def solve_sudoku(initial_board):
+def solve_board(initial_board, engine="bitmask", trace=NULL_TRACE, stats=None, order=None, singles=False, cache=None,
+                portfolio=None, budget=None):
+    # Returns the solved board or None, without printing anything (used by the batch and CLI paths).
+    # Pass a sudoku_stats.SearchStats as stats to collect search counters and phase timings.
+    # engine is "bitmask", "dlx" (exact cover with dancing links) or "backtracking" (the original solver).
+    # Boards can be any size x size with square boxes (9, 16, 25, ...), "dlx" only takes 9x9 boards.
+    # order picks the value ordering ("lcv", "natural" or "random"), both search engines default to "lcv".
+    # singles=True adds hidden single inference to propagation: fewer search nodes, more work per node.
+    # cache is an optional sudoku_cache.SolutionCache, a hit returns without searching.
+    # portfolio=True (or a list of sudoku_portfolio.Strategy) races several configurations in separate
+    # processes instead of running engine, and raises TimeoutError if none finishes within budget seconds.
+    # The trace is not recorded in portfolio mode, stats are the winner's.
+    if cache is not None:
+        return cache.solve(initial_board, lambda board: solve_board(board, engine, trace, stats, order, singles,
+                                                                    portfolio=portfolio, budget=budget))
+    if portfolio:
+        return run_portfolio(initial_board, stats, portfolio, budget)
+    if stats is None:
+        return run_engine(initial_board, engine, trace, None, order, singles)
+    start = time.perf_counter()
+    solved_board = run_engine(initial_board, engine, trace, stats, order, singles)
+    stats.total_time += time.perf_counter() - start
+    return solved_board
+
+def run_portfolio(initial_board, stats, portfolio, budget):
+    from sudoku_portfolio import race, DEFAULT_PORTFOLIO
+
+    result = race(initial_board, DEFAULT_PORTFOLIO if portfolio is True else portfolio, budget)
+    if result.timed_out:
+        raise TimeoutError(f"No solution within the {budget} s time budget")
+    if stats is not None:
+        # Counters of the winning racer, total_time is the wall time of the whole race
+        for field, value in result.stats.as_dict().items():
+            if field == "max_depth":
+                stats.max_depth = max(stats.max_depth, value)
+            elif field != "total_time":
+                setattr(stats, field, getattr(stats, field) + value)
+        stats.total_time += result.elapsed
+    return result.solution
+
+def run_engine(initial_board, engine, trace, stats, order, singles):
+    if order is not None and order not in VALUE_ORDERS:
+        raise ValueError(f"Unknown value order: {order}")
+    if engine == "bitmask":
+        # Above 9x9, search without hidden singles can take seconds on a single Hard board
+        singles = singles or len(initial_board) > 9
+        return solve_with_bitmask(initial_board, trace, stats, order or "lcv", singles)
+    elif engine == "dlx":
+        # Exact cover always branches on the most constrained column, order and singles do not apply
+        if len(initial_board) != 9:
+            raise ValueError("The dlx engine only solves 9x9 boards")
+        return solve_with_dlx(initial_board, trace, stats)
+    elif engine != "backtracking":
+        raise ValueError(f"Unknown solver engine: {engine}")
+
+    ## OLD IMPLEMENTATION
     board = copy.deepcopy(initial_board)
-    
-    if not backtracking(board):
-        print("The puzzle is unsolvable.")
-        logging.info("The puzzle is unsolvable.")
+
+    # backtracking only returns True once every cell of board holds a value, so board is the solution
+    if not backtracking(board, trace=trace, stats=stats, order=order or "lcv", singles=singles):
         return None
-    domains, steps = apply_arc_consistency(board)
-    if domains is None:
-        print("Arc consistency failed. The puzzle might be unsolvable.")
-        logging.info("Arc consistency failed. The puzzle might be unsolvable.")
-        return None    
+    return board
 
-    # Create a new board with resolved values, and we directly inject values with domain size 1, otherwise we keep it empty (0)
-    solved_board = [[domains[i][j][0] if isinstance(domains[i][j], list) and len(domains[i][j]) == 1 else 0 for j in range(9)] for i in range(9)]
+def solve_sudoku(initial_board, engine="bitmask", trace=NULL_TRACE, stats=None, order=None, singles=False, cache=None,
+                 portfolio=None, budget=None):
+    try:
+        solved_board = solve_board(initial_board, engine, trace, stats, order, singles, cache, portfolio, budget)
+    except TimeoutError:
+        print(f"The puzzle was not solved within {budget} seconds.")
+        logging.info(f"The puzzle was not solved within {budget} seconds.")
+        return None
+    if solved_board is None:
+        print("The puzzle is unsolvable.")
+        logging.info("The puzzle is unsolvable.")
     return solved_board
 
-def generate_random_puzzle(difficulty):
-    def remove_cells(board, num_to_remove):
-        removed = 0
-        while removed < num_to_remove:
-            row, col = np.random.randint(0, 9, size=2)
-            if board[row][col] != 0:
-                board[row][col] = 0
-                removed += 1
-
-    filled_range = get_filled_cells_range(difficulty)
-    num_filled = np.random.randint(*filled_range)
-
-    board = np.zeros((9, 9), dtype=int)
-    if not backtracking(board):
-        print("Failed to generate a complete board.")
-        logging.info("Failed to generate a complete board.")
+def generate_full_grid(rng=None, size=9):
+    # A fixed valid pattern shuffled with the Sudoku symmetries (digit relabeling, row/column
+    # permutations inside bands and stacks, band/stack permutations, transpose), so no search is needed.
+    import numpy as np
+
+    rng = np.random.default_rng(rng)
+    box = board_geometry(size).box
+    base = np.array([[(box * (r % box) + r // box + c) % size for c in range(size)] for r in range(size)])
+    digits = rng.permutation(size) + 1
+    rows = [box * band + r for band in rng.permutation(box) for r in rng.permutation(box)]
+    cols = [box * stack + c for stack in rng.permutation(box) for c in rng.permutation(box)]
+    grid = digits[base[np.ix_(rows, cols)]]
+    if rng.integers(2):
+        grid = grid.T.copy()
+    return grid
+
+def remove_cells(board, num_to_remove, rng, singles=False):
+    # Visit cells in random order and only keep a removal if the puzzle still has exactly one solution.
+    # If no further cell can be removed the puzzle keeps a few more clues than requested.
+    size = len(board)
+    removed = 0
+    for cell in rng.permutation(size * size):
+        if removed == num_to_remove:
+            break
+        row, col = divmod(int(cell), size)
+        value = board[row][col]
+        board[row][col] = 0
+        if count_solutions(board, limit=2, singles=singles) == 1:
+            removed += 1
+        else:
+            board[row][col] = value
+
+def remove_rated_cells(board, high, rng, singles=False):
+    # Removes clues in random order while the rating score stays at most high and the solution unique.
+    # A board the rater solves has a unique solution, so below the Trial and Error score the rating
+    # replaces the uniqueness check. Removing a clue never makes a puzzle easier, once a removal
+    # pushes the score above high that cell stays.
+    size = len(board)
+    rated = high < SCORES[TRIAL_AND_ERROR]
+    for cell in rng.permutation(size * size):
+        row, col = divmod(int(cell), size)
+        value = board[row][col]
+        board[row][col] = 0
+        if rated:
+            rating = rate_puzzle(board)
+            keep = rating.solved and rating.score <= high
+        else:
+            keep = count_solutions(board, limit=2, singles=singles) == 1
+        if not keep:
+            board[row][col] = value
+
+def generate_random_puzzle(difficulty, seed=None, size=9, score=None, attempts=20):
+    # seed can be an int for a reproducible puzzle, or a numpy Generator shared across calls.
+    # size is the board side (9, 16, 25, ...), clue counts scale with the number of cells.
+    # score=(low, high) targets a sudoku_rating score instead of the clue range of difficulty: clues are
+    # removed while the score stays at most high, and the board is kept if it ends at low or above.
+    # Returns None if none of `attempts` solution grids reaches the range.
+    # numpy is only needed here, importing it lazily keeps solver-only imports (CLI, batch workers) fast
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    # Hidden singles cost more per node than they save on 9x9 uniqueness checks, larger boards need them
+    singles = size > 9
+
+    if score is not None:
+        low, high = score
+        for _ in range(attempts):
+            board = generate_full_grid(rng, size)
+            remove_rated_cells(board, high, rng, singles)
+            if rate_puzzle(board).score >= low:
+                return board
         return None
 
-    # Remove cells to match difficulty
-    num_to_remove = 81 - num_filled
-    remove_cells(board, num_to_remove)
+    filled_range = get_filled_cells_range(difficulty, size)
+    while True:
+        num_filled = rng.integers(*filled_range)
 
-    return board
+        board = generate_full_grid(rng, size)
+
+        # Remove cells to match difficulty
+        num_to_remove = size * size - num_filled
+        remove_cells(board, num_to_remove, rng, singles)
+
+        # A removal order can get stuck above the clue range of difficulty, such a board is
+        # replaced with a fresh grid so every puzzle passes the GUI's clue count check
+        if np.count_nonzero(board) <= filled_range[1]:
+            return board
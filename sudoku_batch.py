@@ -0,0 +1,108 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+from sudoku import solve_board
+from sudoku_io import read_puzzles
+from sudoku_stats import SearchStats
+
+# index is the position of the board in the input, results are yielded in completion order
+# cached is True when the solution came from the worker's solution cache, timed_out when a portfolio
+# solve ran out of its time budget (solution is None but the board may be solvable)
+SolveResult = namedtuple("SolveResult", ["index", "board", "solution", "elapsed", "unsolvable", "stats", "cached",
+                                         "timed_out"], defaults=[None, False, False])
+
+# Per-process solution cache used when solve_many(..., cache=True), so each pool worker keeps its own
+solution_cache = None
+
+
+def get_solution_cache():
+    global solution_cache
+    if solution_cache is None:
+        from sudoku_cache import SolutionCache
+
+        solution_cache = SolutionCache(maxsize=4096)
+    return solution_cache
+
+
+def iter_chunks(boards, chunk_size):
+    numbered = enumerate(boards)
+    chunk = list(islice(numbered, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(numbered, chunk_size))
+
+
+def solve_chunk(chunk, engine, collect_stats=False, order=None, singles=False, cache=False, portfolio=False,
+                budget=None):
+    if engine == "vector":
+        return solve_chunk_vectorized(chunk, collect_stats, order, singles)
+    lookup_cache = get_solution_cache() if cache else None
+    results = []
+    for index, board in chunk:
+        stats = SearchStats() if collect_stats else None
+        hits = lookup_cache.hits if cache else 0
+        start = time.perf_counter()
+        try:
+            solution = solve_board(board, engine, stats=stats, order=order, singles=singles, cache=lookup_cache,
+                                   portfolio=portfolio, budget=budget)
+        except TimeoutError:
+            results.append(SolveResult(index, board, None, time.perf_counter() - start, False, stats, False, True))
+            continue
+        elapsed = time.perf_counter() - start
+        cached = cache and lookup_cache.hits > hits
+        results.append(SolveResult(index, board, solution, elapsed, solution is None, stats, cached))
+    return results
+
+
+def solve_chunk_vectorized(chunk, collect_stats=False, order=None, singles=False):
+    # The whole chunk is propagated at once, so elapsed is the chunk time split evenly over its boards
+    from sudoku_vector import solve_batch
+
+    boards = [board for _, board in chunk]
+    stats = [SearchStats() for _ in chunk] if collect_stats else None
+    start = time.perf_counter()
+    solutions = solve_batch(boards, "bitmask", stats, order, singles)
+    elapsed = (time.perf_counter() - start) / len(chunk)
+    results = []
+    for i, (index, board) in enumerate(chunk):
+        if stats is not None:
+            stats[i].total_time = elapsed
+        results.append(SolveResult(index, board, solutions[i], elapsed, solutions[i] is None,
+                                   stats[i] if stats is not None else None))
+    return results
+
+
+def solve_many(boards, engine="bitmask", workers=None, chunk_size=64, collect_stats=False, order=None, singles=False,
+               cache=False, portfolio=False, budget=None):
+    # boards is any iterable of 9x9 boards, or the path of a puzzle file.
+    # engine="vector" propagates each chunk as one numpy batch and searches only the boards left open.
+    # cache=True looks every board up in a per-process SolutionCache first (not used by "vector").
+    # portfolio=True races strategies per board (see sudoku_portfolio), it already uses every core,
+    # so it needs workers=1.
+    if portfolio and workers != 1:
+        raise ValueError("Portfolio solving races on all cores, use it with workers=1")
+    if isinstance(boards, (str, os.PathLike)):
+        boards = read_puzzles(boards)
+    chunks = iter_chunks(boards, chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from solve_chunk(chunk, engine, collect_stats, order, singles, cache, portfolio, budget)
+        return
+
+    # Only a couple of chunks per worker are in flight, so huge inputs are never fully loaded
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in islice(chunks, workers * 2):
+            pending.add(pool.submit(solve_chunk, chunk, engine, collect_stats, order, singles, cache))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    pending.add(pool.submit(solve_chunk, chunk, engine, collect_stats, order, singles, cache))
@@ -0,0 +1,258 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from sudoku import solve_board, generate_random_puzzle
+from sudoku_io import parse_puzzle_line, read_puzzles
+from sudoku_rating import rate_puzzle
+from sudoku_stats import SearchStats
+
+# Benchmark harness: python -m sudoku_bench --output results.json [--baseline baseline.json]
+# Timings are taken without statistics collection. Node counts and peak memory come from a
+# second, untimed pass because SearchStats timers and tracemalloc slow the solver down.
+
+DIFFICULTIES = ["Easy", "Moderate", "Hard"]
+
+# Known 17-clue puzzles (minimum clue count, unique solution)
+HARD_17_CLUE = [
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+    "000000010400000000020000000000050604008000300001090000300400200050100000000807000",
+    "000000012000035000000600070700000300000400800100000000000120000080000040050000600",
+    "000000012003600000000007000410020000000500300700000600280000040000300500000000000",
+    "000000012008030000000000040120500000000004700060000000507000300000620000000100000",
+    "000000013000030080070000000000206000030000900000010000600500204000400700100000000",
+    "000000013000200000000000080000760200008000400010000000200000750600340000000008000",
+]
+
+# Metrics where a larger value is a regression, and the one where a smaller value is
+LOWER_IS_BETTER = ["p50_ms", "p95_ms", "p99_ms", "mean_nodes", "peak_kib"]
+HIGHER_IS_BETTER = ["throughput"]
+
+
+def build_corpora(count, seed):
+    # Every difficulty gets its own seeded generator, so adding a difficulty never changes the others
+    corpora = {}
+    for offset, difficulty in enumerate(DIFFICULTIES):
+        rng = np.random.default_rng(seed + offset)
+        corpora[difficulty] = [generate_random_puzzle(difficulty, rng) for _ in range(count)]
+    corpora["17-clue"] = [parse_puzzle_line(line) for line in HARD_17_CLUE]
+    return corpora
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(times, nodes=None, backtracks=None, peak=None):
+    times = sorted(times)
+    result = {
+        "count": len(times),
+        "total_s": sum(times),
+        "throughput": len(times) / sum(times) if sum(times) else 0.0,
+        "p50_ms": percentile(times, 0.50) * 1000,
+        "p95_ms": percentile(times, 0.95) * 1000,
+        "p99_ms": percentile(times, 0.99) * 1000,
+        "max_ms": times[-1] * 1000,
+    }
+    if nodes is not None:
+        result["mean_nodes"] = sum(nodes) / len(nodes)
+        result["max_nodes"] = max(nodes)
+        result["mean_backtracks"] = sum(backtracks) / len(backtracks)
+    if peak is not None:
+        result["peak_kib"] = peak / 1024
+    return result
+
+
+def bench_solver(boards, engine, repeat, order=None, singles=False):
+    if engine == "vector":
+        return bench_vector(boards, repeat, order, singles)
+    # "portfolio" races the default sudoku_portfolio strategies, order and singles do not apply
+    portfolio = engine == "portfolio"
+    if portfolio:
+        engine = "bitmask"
+    times = []
+    for board in boards:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            solve_board(board, engine, order=order, singles=singles, portfolio=portfolio)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+
+    nodes, backtracks = [], []
+    tracemalloc.start()
+    for board in boards:
+        stats = SearchStats()
+        solve_board(board, engine, stats=stats, order=order, singles=singles, portfolio=portfolio)
+        nodes.append(stats.nodes)
+        backtracks.append(stats.backtracks)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(times, nodes, backtracks, peak)
+
+
+def bench_vector(boards, repeat, order=None, singles=False):
+    # The batch engine solves the whole corpus in one call, every board gets the mean time per board
+    from sudoku_vector import solve_batch
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        solve_batch(boards, order=order, singles=singles)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    stats = [SearchStats() for _ in boards]
+    tracemalloc.start()
+    solve_batch(boards, stats=stats, order=order, singles=singles)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize([best / len(boards)] * len(boards), [s.nodes for s in stats], [s.backtracks for s in stats], peak)
+
+
+def bench_rater(boards, repeat):
+    times = []
+    for board in boards:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rate_puzzle(board)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+
+    tracemalloc.start()
+    for board in boards:
+        rate_puzzle(board)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(times, peak=peak)
+
+
+def bench_generator(difficulty, count, seed):
+    rng = np.random.default_rng(seed)
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        generate_random_puzzle(difficulty, rng)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    generate_random_puzzle(difficulty, np.random.default_rng(seed))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(times, peak=peak)
+
+
+def run_benchmarks(engines=("bitmask",), count=20, seed=2024, repeat=3, corpus=None, generate=True, orders=(None,),
+                   singles=(False,), rate=True):
+    if corpus is not None:
+        corpora = {"custom": list(read_puzzles(corpus))}
+    else:
+        corpora = build_corpora(count, seed)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "count": count,
+            "seed": seed,
+            "repeat": repeat,
+            "orders": list(orders),
+            "singles": list(singles),
+        },
+        "benchmarks": {},
+    }
+    for engine in engines:
+        for order in orders:
+            for with_singles in singles:
+                # Without --orders each engine runs with its default value ordering
+                label = engine if order is None else f"{engine}-{order}"
+                if with_singles:
+                    label += "+singles"
+                for name, boards in corpora.items():
+                    print(f"solve [{label}] {name} ({len(boards)} puzzles)", file=sys.stderr)
+                    results["benchmarks"][f"solve/{label}/{name}"] = bench_solver(boards, engine, repeat, order,
+                                                                                   with_singles)
+    if rate:
+        for name, boards in corpora.items():
+            print(f"rate {name} ({len(boards)} puzzles)", file=sys.stderr)
+            results["benchmarks"][f"rate/{name}"] = bench_rater(boards, repeat)
+    if generate:
+        for offset, difficulty in enumerate(DIFFICULTIES):
+            print(f"generate {difficulty} ({count} puzzles)", file=sys.stderr)
+            results["benchmarks"][f"generate/{difficulty}"] = bench_generator(difficulty, count, seed + offset)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Returns a list of (benchmark, metric, baseline value, current value) that got worse than tolerance
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        for metric in LOWER_IS_BETTER:
+            if metric in current and metric in previous and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append((name, metric, previous[metric], current[metric]))
+        for metric in HIGHER_IS_BETTER:
+            if metric in current and metric in previous and current[metric] < previous[metric] * (1 - tolerance):
+                regressions.append((name, metric, previous[metric], current[metric]))
+    return regressions
+
+
+def print_report(results):
+    print(f"{'benchmark':<42}{'n':>5}{'puzzles/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'nodes':>10}{'peak KiB':>10}")
+    for name, row in results["benchmarks"].items():
+        nodes = f"{row['mean_nodes']:.1f}" if "mean_nodes" in row else "-"
+        print(f"{name:<42}{row['count']:>5}{row['throughput']:>12.1f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+              f"{row['p99_ms']:>10.3f}{nodes:>10}{row['peak_kib']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sudoku_bench", description="Solver and generator benchmarks.")
+    parser.add_argument("--engines", nargs="+", default=["bitmask"], help="e.g. --engines bitmask dlx vector backtracking portfolio")
+    parser.add_argument("--orders", nargs="+", choices=["natural", "lcv", "random"], default=[None],
+                        help="value orderings to compare, e.g. --orders natural lcv")
+    parser.add_argument("--singles", choices=["off", "on", "both"], default="off",
+                        help="hidden single inference during propagation, 'both' runs each solver twice")
+    parser.add_argument("--count", type=int, default=20, help="puzzles per difficulty")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--repeat", type=int, default=3, help="time each solve this many times and keep the best")
+    parser.add_argument("--corpus", help="benchmark this puzzle file instead of the generated corpora")
+    parser.add_argument("--no-generate", action="store_true", help="skip the generator benchmarks")
+    parser.add_argument("--no-rate", action="store_true", help="skip the difficulty rater benchmarks")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    singles = {"off": (False,), "on": (True,), "both": (False, True)}[args.singles]
+    results = run_benchmarks(args.engines, args.count, args.seed, args.repeat, args.corpus, not args.no_generate,
+                             args.orders, singles, not args.no_rate)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, previous, current in regressions:
+            print(f"REGRESSION {name} {metric}: {previous:.3f} -> {current:.3f}")
+        if regressions:
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+import random
+import threading
+import time
+
+from sudoku_utils import board_geometry
+from sudoku_trace import NULL_TRACE, TRY_CELL, TRY_VALUE, APPLY_AC, AC_OK, CONFLICT, DEAD_END, PROCESS_CELL, REVISE
+
+ALL_DIGITS = 0x1FF  # bit (d - 1) set means digit d is still a candidate
+
+POPCOUNT = tuple(bin(mask).count("1") for mask in range(ALL_DIGITS + 1))
+MASK_DIGITS = tuple(tuple(d for d in range(1, 10) if mask & (1 << (d - 1))) for mask in range(ALL_DIGITS + 1))
+
+# Value ordering heuristics for the search
+VALUE_ORDERS = ("natural", "lcv", "random")
+
+
+def digits_of(mask):
+    digits = []
+    while mask:
+        bit = mask & -mask
+        digits.append(bit.bit_length())
+        mask ^= bit
+    return digits
+
+
+def bit_count(mask):
+    return bin(mask).count("1")
+
+
+class ComputedTable:
+    # Stands in for a mask-indexed lookup table that would be too large to build (2**25 masks on 25x25)
+    __slots__ = ("function",)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __getitem__(self, mask):
+        return self.function(mask)
+
+
+mask_tables = {9: (POPCOUNT, MASK_DIGITS)}
+
+
+def get_mask_tables(size):
+    # (popcount, digits) tables indexed by candidate mask for a board of this size
+    if size not in mask_tables:
+        masks = range(1 << size)
+        popcount = tuple(bit_count(mask) for mask in masks) if size <= 16 else ComputedTable(bit_count)
+        digits = tuple(tuple(digits_of(mask)) for mask in masks) if size <= 9 else ComputedTable(digits_of)
+        mask_tables[size] = (popcount, digits)
+    return mask_tables[size]
+
+
+class BitmaskState:
+    __slots__ = ("cells", "candidates", "trail", "queue", "trace", "stats", "propagations", "order", "rng",
+                 "singles", "size", "all_digits", "row_of", "col_of", "peers", "units", "units_of", "popcount",
+                 "mask_digits")
+
+    def __init__(self, trace=NULL_TRACE, stats=None, order="lcv", rng=None, singles=False, size=9):
+        if order not in VALUE_ORDERS:
+            raise ValueError(f"Unknown value order: {order}")
+        # Index tables of the board size, a size x size board has size-bit candidate masks
+        geometry = board_geometry(size)
+        self.size = size
+        self.all_digits = (1 << size) - 1
+        self.row_of, self.col_of = geometry.row_of, geometry.col_of
+        self.peers, self.units, self.units_of = geometry.peers, geometry.units, geometry.units_of
+        self.popcount, self.mask_digits = get_mask_tables(size)
+        self.cells = [0] * geometry.cell_count
+        self.candidates = [self.all_digits] * geometry.cell_count
+        # Flat (cell, old mask) pairs for every candidate change, rolled back with undo()
+        self.trail = []
+        self.queue = []
+        self.trace = trace
+        self.stats = stats
+        self.propagations = 0
+        self.order = order
+        self.rng = rng if rng is not None else random.Random()
+        # Also place hidden singles (a digit with only one possible cell left in a unit) while propagating
+        self.singles = singles
+
+    def reset(self):
+        # Back to an empty board in place, so one state can be reused for many boards
+        cells = len(self.cells)
+        self.cells[:] = (0,) * cells
+        self.candidates[:] = (self.all_digits,) * cells
+        self.trail.clear()
+        self.queue.clear()
+        self.propagations = 0
+
+    def load(self, board):
+        # Returns False if the givens already conflict with each other
+        if len(board) != self.size:
+            raise ValueError(f"Expected a {self.size}x{self.size} board, got {len(board)} rows")
+        singles, self.singles = self.singles, False
+        row_of, col_of = self.row_of, self.col_of
+        for i in range(len(self.cells)):
+            num = int(board[row_of[i]][col_of[i]])
+            if num != 0 and not self.assign(i, num):
+                self.singles = singles
+                return False
+        # Hidden singles are searched once over all units after the givens, not after every given
+        self.singles = singles
+        return not singles or self.propagate_singles(range(len(self.units)))
+
+    def assign(self, idx, num):
+        bit = 1 << (num - 1)
+        old = self.candidates[idx]
+        if not old & bit:
+            return False
+        self.cells[idx] = num
+        if old != bit:
+            self.trail.append(idx)
+            self.trail.append(old)
+            self.candidates[idx] = bit
+        return self.propagate(idx)
+
+    def propagate(self, idx):
+        # Incremental propagation: only the peers of a cell whose domain became a
+        # single value are revised, and every removal is recorded on the trail.
+        trail, queue = self.trail, self.queue
+        mark = len(trail)
+        queue.clear()
+        queue.append(idx)
+        if not self.propagate_queue():
+            return False
+        if self.singles:
+            return self.propagate_singles(self.changed_units(mark).union(self.units_of[idx]))
+        return True
+
+    def changed_units(self, mark):
+        units_of = self.units_of
+        return {unit for cell in self.trail[mark::2] for unit in units_of[cell]}
+
+    def propagate_singles(self, units):
+        # Hidden singles can only appear in units where some candidate was just removed,
+        # so each pass rescans only those units, then propagates the cells it narrowed.
+        while True:
+            mark = len(self.trail)
+            found = self.find_hidden_singles(units)
+            if found is None:
+                return False
+            if not found:
+                return True
+            if not self.propagate_queue():
+                return False
+            units = self.changed_units(mark)
+
+    def propagate_queue(self):
+        candidates, trail, queue, peers = self.candidates, self.trail, self.queue, self.peers
+        trace = self.trace
+        tracing = trace.enabled
+        row_of, col_of = self.row_of, self.col_of
+        processed = 0
+        while queue:
+            cell = queue.pop()
+            processed += 1
+            bit = candidates[cell]
+            if tracing:
+                trace.emit(PROCESS_CELL, row_of[cell], col_of[cell])
+            for peer in peers[cell]:
+                mask = candidates[peer]
+                if mask & bit:
+                    if tracing:
+                        trace.emit(REVISE, row_of[peer], col_of[peer], digits_of(bit), row_of[cell], col_of[cell])
+                    trail.append(peer)
+                    trail.append(mask)
+                    mask ^= bit
+                    candidates[peer] = mask
+                    if mask == 0:
+                        self.propagations += processed
+                        return False
+                    if mask & (mask - 1) == 0:
+                        queue.append(peer)
+        self.propagations += processed
+        return True
+
+    def find_hidden_singles(self, units):
+        # Narrows every hidden single in the given units to its digit and queues it for propagation.
+        # Returns the number found, or None if some digit has no cell left in a unit.
+        candidates, trail, queue, all_digits = self.candidates, self.trail, self.queue, self.all_digits
+        for index in units:
+            unit = self.units[index]
+            once = twice = 0
+            for cell in unit:
+                mask = candidates[cell]
+                twice |= once & mask
+                once |= mask
+            if once != all_digits:
+                return None
+            hidden = once & ~twice
+            if not hidden:
+                continue
+            for cell in unit:
+                mask = candidates[cell]
+                bit = mask & hidden
+                if bit and mask != bit:
+                    if bit & (bit - 1):
+                        # Two digits that can each only go in this one cell
+                        return None
+                    trail.append(cell)
+                    trail.append(mask)
+                    candidates[cell] = bit
+                    queue.append(cell)
+        return len(queue)
+
+    def undo(self, mark):
+        candidates, trail = self.candidates, self.trail
+        while len(trail) > mark:
+            old = trail.pop()
+            candidates[trail.pop()] = old
+
+    def unassign(self, idx, num):
+        self.cells[idx] = 0
+
+    def peer_support(self, idx, bit):
+        # How many peer domains still contain the value, i.e. how many peers would lose an option
+        candidates = self.candidates
+        count = 0
+        for peer in self.peers[idx]:
+            if candidates[peer] & bit:
+                count += 1
+        return count
+
+    def ordered_values(self, idx):
+        values = self.mask_digits[self.candidates[idx]]
+        if self.order == "lcv" and len(values) > 1:
+            return sorted(values, key=lambda num: self.peer_support(idx, 1 << (num - 1)))
+        if self.order == "random":
+            values = list(values)
+            self.rng.shuffle(values)
+        return values
+
+    def select_mrv_cell(self):
+        # Empty cell with the fewest candidate bits, or None if the board is full
+        best, best_count = None, self.size + 1
+        cells, candidates, popcount = self.cells, self.candidates, self.popcount
+        for i in range(len(cells)):
+            if cells[i] == 0:
+                count = popcount[candidates[i]]
+                if count < best_count:
+                    best, best_count = i, count
+                    if count <= 1:
+                        break
+        return best
+
+    def to_board(self):
+        size = self.size
+        return [self.cells[r * size:r * size + size] for r in range(size)]
+
+
+class Solver:
+    # Reusable solver: the state and the search stack are allocated once and reset for every board.
+    # The search runs on an explicit stack of (cell, remaining values, trail mark) frames instead of
+    # recursing, a failed value is rolled back by trimming the trail to the frame's mark.
+    # With max_nodes, the search gives up after trying that many values and sets cutoff.
+    __slots__ = ("state", "stack", "cutoff")
+
+    def __init__(self, order="lcv", singles=False, rng=None, size=9):
+        self.state = BitmaskState(order=order, rng=rng, singles=singles, size=size)
+        self.stack = []
+        self.cutoff = False
+
+    def solve(self, board, trace=NULL_TRACE, stats=None, max_nodes=None):
+        # Returns the solved board or None, which means unsolvable unless cutoff is set
+        self.cutoff = False
+        state = self.state
+        state.reset()
+        state.trace = trace
+        state.stats = stats
+        solved = state.load(board)
+        if stats is not None:
+            # Removals made while loading the givens stay on the trail, search removals are counted per node
+            stats.revisions += len(state.trail) // 2
+        solved = solved and self.search(-1 if max_nodes is None else max_nodes)
+        if stats is not None:
+            stats.propagations += state.propagations
+        return state.to_board() if solved else None
+
+    def search(self, max_nodes=-1):
+        state, stack = self.state, self.stack
+        stats, trace = state.stats, state.trace
+        tracing = trace.enabled
+        cells, trail = state.cells, state.trail
+        select_mrv_cell, ordered_values = state.select_mrv_cell, state.ordered_values
+        row_of, col_of = state.row_of, state.col_of
+        assign, unassign, undo = state.assign, state.unassign, state.undo
+        stack.clear()
+        idx = None
+        consistent = True
+        nodes = 0
+
+        while True:
+            if consistent:
+                # The last value held (or this is the start): pick the next MRV cell and push its frame
+                if stats is not None:
+                    stats.max_depth = max(stats.max_depth, len(stack))
+                    start = time.perf_counter()
+                    idx = select_mrv_cell()
+                    stats.mrv_time += time.perf_counter() - start
+                else:
+                    idx = select_mrv_cell()
+                if idx is None:
+                    return True
+                if stats is not None:
+                    start = time.perf_counter()
+                    values = ordered_values(idx)
+                    stats.lcv_time += time.perf_counter() - start
+                else:
+                    values = ordered_values(idx)
+                if tracing:
+                    trace.emit(TRY_CELL, row_of[idx], col_of[idx], list(values))
+                mark = len(trail)
+                values = iter(values)
+                stack.append((idx, values, mark))
+            else:
+                num = cells[idx]
+                if num:
+                    # Back at this cell: its value failed in propagation or somewhere below
+                    if tracing:
+                        trace.emit(CONFLICT, row_of[idx], col_of[idx], num)
+                    if stats is not None:
+                        stats.backtracks += 1
+                    unassign(idx, num)
+                    undo(mark)
+
+            num = next(values, None)
+            if num is None:
+                stack.pop()
+                if tracing:
+                    trace.emit(DEAD_END, row_of[idx], col_of[idx])
+                if not stack:
+                    return False
+                idx, values, mark = stack[-1]
+                consistent = False
+                continue
+
+            if nodes == max_nodes:
+                self.cutoff = True
+                return False
+            nodes += 1
+            if tracing:
+                trace.emit(TRY_VALUE, row_of[idx], col_of[idx], num)
+                trace.emit(APPLY_AC)
+            if stats is not None:
+                stats.nodes += 1
+                start = time.perf_counter()
+                consistent = assign(idx, num)
+                stats.propagation_time += time.perf_counter() - start
+                stats.revisions += (len(trail) - mark) // 2
+            else:
+                consistent = assign(idx, num)
+            if consistent and tracing:
+                trace.emit(AC_OK)
+
+
+# One solver per thread and settings, so repeated solve_with_bitmask calls reuse their state
+solvers = threading.local()
+
+
+def get_solver(order="lcv", singles=False, size=9):
+    cache = getattr(solvers, "cache", None)
+    if cache is None:
+        cache = solvers.cache = {}
+    key = (order, singles, size)
+    if key not in cache:
+        cache[key] = Solver(order, singles, size=size)
+    return cache[key]
+
+
+def count_bitmask_solutions(state, limit):
+    # Same search as Solver.search, written recursively, and it keeps going after a solution until `limit` are found
+    idx = state.select_mrv_cell()
+    if idx is None:
+        return 1
+
+    count = 0
+    mask = state.candidates[idx]
+    while mask and count < limit:
+        bit = mask & -mask
+        mask ^= bit
+        num = bit.bit_length()
+        mark = len(state.trail)
+        if state.assign(idx, num):
+            count += count_bitmask_solutions(state, limit - count)
+        state.unassign(idx, num)
+        state.undo(mark)
+    return count
+
+
+def count_solutions(board, limit=2, singles=False):
+    # Number of solutions, capped at limit; limit=2 is enough to tell unique puzzles apart
+    state = BitmaskState(singles=singles, size=len(board))
+    if not state.load(board):
+        return 0
+    return count_bitmask_solutions(state, limit)
+
+
+def solve_with_bitmask(initial_board, trace=NULL_TRACE, stats=None, order="lcv", singles=False):
+    return get_solver(order, singles, len(initial_board)).solve(initial_board, trace, stats)
@@ -0,0 +1,236 @@
+from collections import OrderedDict
+from itertools import permutations, product
+
+import numpy as np
+
+from sudoku_utils import is_valid_sudoku
+
+# Solution cache keyed by a canonical form of the board. Two boards that differ only by digit
+# relabeling, band/stack permutations, row/column permutations inside a band/stack or a transpose
+# get the same key, so solving one of them serves all of them.
+
+# The 1296 column orders allowed by the symmetry group: a stack order and an order inside each stack
+TRIPLES = list(permutations(range(3)))
+COL_PERMS = np.array([[3 * stack + inside[n][c] for n, stack in enumerate(stacks) for c in range(3)]
+                      for stacks in TRIPLES for inside in product(TRIPLES, repeat=3)], dtype=np.intp)
+ROW_WEIGHTS = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+# Boards with a large automorphism group (e.g. almost empty ones) keep too many tied transforms,
+# those are cached under their plain form instead. Real puzzles stay around 5000.
+MAX_CANDIDATES = 20000
+
+
+def board_key(board):
+    # Values above 9 on larger boards take two digits, those keys are comma separated
+    separator = "" if len(board) <= 9 else ","
+    return separator.join(str(int(num)) for row in board for num in row)
+
+
+def canonical_form(board):
+    # Only meant for valid boards (no digit repeated in a unit), returns (key, transform).
+    # The board is built row by row over all symmetry transforms, keeping at each row the transforms
+    # with the smallest blank pattern and then the smallest row with digits renamed in order of first
+    # appearance, so every board of an equivalence class gets the same key.
+    # transform = (transpose, rows, cols, labels) maps the board onto that form, or None when the
+    # board has too many tied transforms and the key is just the board itself.
+    grid = np.asarray(board, dtype=np.intp)
+    grids = np.stack([grid, grid.T])
+
+    # One candidate per (transpose, first row, column order). Most of them are ruled out by the
+    # blank pattern of the first row alone, so that is checked up front on a boolean array.
+    clues = (grids != 0).reshape(18, 9)
+    first_pattern = clues[:, COL_PERMS] @ ROW_WEIGHTS                     # (18, 1296)
+    first, cols = np.nonzero(first_pattern == first_pattern.min())
+    transpose, rows = first // 9, (first % 9)[:, None]
+    labels = np.full((len(first), 10), -1, dtype=np.intp)
+    labels[:, 0] = 0
+    next_label = np.ones(len(first), dtype=np.intp)
+    key_rows = []
+
+    for k in range(9):
+        if k > 0:
+            # Every transform can continue with the same number of rows, so a board with too many
+            # tied transforms is given up on before any of them is expanded
+            count = len(rows)
+            if count * (3 - k % 3 if k % 3 else 9 - k) > MAX_CANDIDATES:
+                return board_key(board), None
+            # Next row: another row of the current band, or the first row of a band not used yet
+            used = rows // 3
+            options = np.tile(np.arange(9), count)
+            owner = np.repeat(np.arange(count), 9)
+            already = (rows[owner] == options[:, None]).any(axis=1)
+            if k % 3:
+                allowed = used[owner, -1] == options // 3
+            else:
+                allowed = ~(used[owner] == (options // 3)[:, None]).any(axis=1)
+            keep = allowed & ~already
+            owner, options = owner[keep], options[keep]
+            transpose, cols = transpose[owner], cols[owner]
+            rows = np.concatenate([rows[owner], options[:, None]], axis=1)
+            labels, next_label = labels[owner], next_label[owner]
+
+        values = grids[transpose[:, None], rows[:, -1:], COL_PERMS[cols]]
+        # Blanks come first: keep the transforms with the smallest blank/clue pattern for this row
+        # before paying for the relabeling, which only has to break ties among those
+        pattern = (values != 0) @ ROW_WEIGHTS
+        keep = pattern == pattern.min()
+        values, transpose, rows, cols = values[keep], transpose[keep], rows[keep], cols[keep]
+        labels, next_label = labels[keep], next_label[keep]
+
+        # Digits seen for the first time get the next free labels, in the order they appear in the row
+        # (a valid board never repeats a digit within a row)
+        index = np.arange(len(values))[:, None]
+        out = labels[index, values]
+        new = (values != 0) & (out == -1)
+        out = np.where(new, next_label[:, None] + np.cumsum(new, axis=1) - 1, out)
+        owner, position = np.nonzero(new)
+        labels[owner, values[owner, position]] = out[owner, position]
+        next_label = next_label + new.sum(axis=1)
+
+        # Then keep the transforms that give the smallest relabeled row
+        encoded = out @ ROW_WEIGHTS
+        best = encoded.min()
+        keep = encoded == best
+        transpose, rows, cols = transpose[keep], rows[keep], cols[keep]
+        labels, next_label = labels[keep], next_label[keep]
+        key_rows.append(out[keep][0])
+
+    key = "".join(str(num) for row in key_rows for num in row)
+    # Digits that are not on the board get the remaining labels in order, so the relabeling is complete
+    label = labels[0].copy()
+    unused = iter(range(int(next_label[0]), 10))
+    for digit in range(1, 10):
+        if label[digit] == -1:
+            label[digit] = next(unused)
+    return key, (int(transpose[0]), rows[0].tolist(), COL_PERMS[cols[0]].tolist(), label.tolist())
+
+
+def canonical_entry(board, canonical=True):
+    # (key, transform) a board is cached under, its plain key when canonical_form does not apply.
+    # The symmetry group used by canonical_form is the 9x9 one, larger boards use their plain key.
+    if canonical and len(board) == 9 and is_valid_sudoku(board):
+        return canonical_form(board)
+    return board_key(board), None
+
+
+def to_canonical(board, transform):
+    transpose, rows, cols, label = transform
+    grid = np.asarray(board, dtype=np.intp)
+    if transpose:
+        grid = grid.T
+    return np.asarray(label)[grid[np.ix_(rows, cols)]].tolist()
+
+
+def from_canonical(solution, transform):
+    transpose, rows, cols, label = transform
+    digit = np.zeros(10, dtype=np.intp)
+    digit[label] = np.arange(10)
+    grid = np.zeros((9, 9), dtype=np.intp)
+    grid[np.ix_(rows, cols)] = digit[np.asarray(solution, dtype=np.intp)]
+    if transpose:
+        grid = grid.T
+    return grid.tolist()
+
+
+UNSOLVABLE = "unsolvable"
+
+
+class SolutionCache:
+    # LRU cache of solutions. Boards seen before in exactly the same form are found with a plain
+    # dict lookup, everything else pays for one canonical_form() before looking up the shared entry.
+    # Unsolvable boards are cached too. solve() wraps a solver call, lookup()/store() are for callers
+    # that solve asynchronously. lookup_exact() and lookup_canonical() are the two halves of lookup(),
+    # for callers that keep the canonical_entry() of a board to pass to store() later.
+
+    def __init__(self, maxsize=1024, canonical=True):
+        self.maxsize = maxsize
+        self.canonical = canonical
+        self.exact = OrderedDict()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Canonical form of the last missed board, so store() does not compute it again
+        self.last_miss = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def remember(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        if len(table) > self.maxsize:
+            table.popitem(last=False)
+
+    def lookup(self, board):
+        # Returns (found, solution), solution is None for a cached unsolvable board
+        found, solution = self.lookup_exact(board)
+        if found:
+            return found, solution
+        return self.lookup_canonical(board, *canonical_entry(board, self.canonical))
+
+    def lookup_exact(self, board):
+        # Only the plain dict lookup, a board not found here still has to go through lookup_canonical()
+        key = board_key(board)
+        if key not in self.exact:
+            return False, None
+        self.hits += 1
+        self.exact.move_to_end(key)
+        solution = self.exact[key]
+        return True, None if solution is UNSOLVABLE else [row[:] for row in solution]
+
+    def lookup_canonical(self, board, canonical_key, transform):
+        key = board_key(board)
+        if canonical_key not in self.entries:
+            self.misses += 1
+            self.last_miss = (key, canonical_key, transform)
+            return False, None
+
+        self.hits += 1
+        self.entries.move_to_end(canonical_key)
+        canonical_solution = self.entries[canonical_key]
+        if canonical_solution is UNSOLVABLE:
+            solution = None
+        elif transform is None:
+            solution = [row[:] for row in canonical_solution]
+        else:
+            solution = from_canonical(canonical_solution, transform)
+        self.remember(self.exact, key, UNSOLVABLE if solution is None else [row[:] for row in solution])
+        return True, solution
+
+    def store(self, board, solution, entry=None):
+        # entry is the board's canonical_entry() if the caller already has it
+        key = board_key(board)
+        if entry is not None:
+            canonical_key, transform = entry
+        elif self.last_miss is not None and self.last_miss[0] == key:
+            canonical_key, transform = self.last_miss[1:]
+        else:
+            canonical_key, transform = canonical_entry(board, self.canonical)
+        self.last_miss = None
+
+        if solution is None:
+            canonical_solution = UNSOLVABLE
+        elif transform is None:
+            canonical_solution = [row[:] for row in solution]
+        else:
+            canonical_solution = to_canonical(solution, transform)
+        self.remember(self.entries, canonical_key, canonical_solution)
+        self.remember(self.exact, key, UNSOLVABLE if solution is None else [row[:] for row in solution])
+
+    def solve(self, board, solve):
+        # solve(board) is called on a miss and must return the solution or None
+        found, solution = self.lookup(board)
+        if not found:
+            solution = solve(board)
+            self.store(board, solution)
+        return solution
+
+    def clear(self):
+        self.exact.clear()
+        self.entries.clear()
+        self.last_miss = None
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Headless entry point: python -m sudoku_cli {solve,generate,bench} ...
+# Solver modules are imported inside each command so `--help` and argument errors stay instant,
+# and nothing here imports pygame or configures logging.
+
+DIFFICULTIES = ["Easy", "Moderate", "Hard"]
+
+
+def open_input(path):
+    if path is None or path == "-":
+        return sys.stdin
+    return open(path)
+
+
+def open_output(path):
+    if path is None or path == "-":
+        return sys.stdout
+    return open(path, "w")
+
+
+def cmd_solve(args):
+    from sudoku_batch import solve_many
+    from sudoku_io import read_puzzles, format_puzzle_line
+
+    # solve_many yields in completion order, buffer so output lines match input lines
+    with open_input(args.input) as stream:
+        pending = {}
+        next_index = 0
+        unsolvable = 0
+        timed_out = 0
+        cached = 0
+        results = solve_many(read_puzzles(stream), args.engine, args.workers, args.chunk_size, args.stats, args.order,
+                             args.singles, args.cache, args.portfolio, args.budget)
+        for result in results:
+            cached += result.cached
+            pending[result.index] = result
+            while next_index in pending:
+                result = pending.pop(next_index)
+                if args.stats:
+                    print(json.dumps(result.stats.as_dict()), file=sys.stderr)
+                if result.timed_out:
+                    timed_out += 1
+                    print("timeout")
+                elif result.unsolvable:
+                    unsolvable += 1
+                    print("unsolvable")
+                else:
+                    print(format_puzzle_line(result.solution))
+                next_index += 1
+    if args.cache:
+        print(f"solution cache: {cached} hits, {next_index - cached} misses", file=sys.stderr)
+    if unsolvable:
+        print(f"{unsolvable} of {next_index} puzzles are unsolvable.", file=sys.stderr)
+    if timed_out:
+        print(f"{timed_out} of {next_index} puzzles were not solved within {args.budget} s.", file=sys.stderr)
+    return 1 if unsolvable or timed_out else 0
+
+
+def cmd_generate(args):
+    import numpy as np
+    from sudoku import generate_random_puzzle
+    from sudoku_io import format_puzzle_line
+
+    score = args.score
+    if args.rated:
+        from sudoku_rating import DIFFICULTY_SCORES
+
+        score = DIFFICULTY_SCORES[args.difficulty]
+    rng = np.random.default_rng(args.seed)
+    for _ in range(args.count):
+        board = generate_random_puzzle(args.difficulty, rng, args.size, score)
+        if board is None:
+            print(f"No puzzle with a score in {score[0]}-{score[1]} was found.", file=sys.stderr)
+            return 1
+        print(format_puzzle_line(board))
+    return 0
+
+
+def cmd_rate(args):
+    from sudoku_io import read_puzzles
+    from sudoku_rating import rate_puzzle, difficulty_of
+
+    tiers = {}
+    unsolvable = 0
+    with open_input(args.input) as stream:
+        for board in read_puzzles(stream):
+            rating = rate_puzzle(board)
+            if rating is None:
+                unsolvable += 1
+                print("unsolvable")
+                continue
+            tier = difficulty_of(rating.score)
+            tiers[tier] = tiers.get(tier, 0) + 1
+            if args.stats:
+                print(json.dumps(rating.steps), file=sys.stderr)
+            print(f"{rating.score:.1f} {tier} {rating.technique}")
+    print(", ".join(f"{tier}: {count}" for tier, count in tiers.items()), file=sys.stderr)
+    if unsolvable:
+        print(f"{unsolvable} puzzles are unsolvable.", file=sys.stderr)
+    return 1 if unsolvable else 0
+
+
+def cmd_pipeline(args):
+    from sudoku_pipeline import GenerationPipeline, format_stats
+
+    def report(stats):
+        print(format_stats(stats), file=sys.stderr)
+
+    pipeline = GenerationPipeline(args.difficulty, args.size, args.workers, queue_size=args.queue_size, seed=args.seed)
+    output = open_output(args.output)
+    pipeline.start()
+    written = 0
+    try:
+        written = pipeline.write(output, args.count, args.progress, report)
+    except KeyboardInterrupt:
+        # Overnight runs without --count end with Ctrl-C, the puzzles written so far are complete lines
+        pass
+    except BrokenPipeError:
+        # The reader of the stream went away (e.g. piped into head), nothing more can be written
+        os.dup2(os.open(os.devnull, os.O_WRONLY), output.fileno())
+    finally:
+        stats = pipeline.stats()
+        pipeline.stop()
+        if output is not sys.stdout:
+            output.close()
+    report(stats)
+    print(f"{stats['write']['processed']} puzzles written", file=sys.stderr)
+    return 0 if args.count is None or written == args.count else 1
+
+
+def cmd_bench(args):
+    from sudoku import generate_random_puzzle
+    from sudoku_batch import solve_many
+    from sudoku_io import read_puzzles
+
+    if args.input is not None:
+        with open_input(args.input) as stream:
+            boards = list(read_puzzles(stream))
+    else:
+        boards = [generate_random_puzzle(args.difficulty, size=args.size) for _ in range(args.count)]
+
+    start = time.perf_counter()
+    results = list(solve_many(boards, args.engine, args.workers, args.chunk_size, order=args.order,
+                              singles=args.singles, cache=args.cache, portfolio=args.portfolio, budget=args.budget))
+    times = [result.elapsed for result in results]
+    wall = time.perf_counter() - start
+    if not times:
+        print("No puzzles to benchmark.", file=sys.stderr)
+        return 1
+
+    times.sort()
+    print(f"puzzles: {len(times)}")
+    print(f"wall time: {wall:.3f} s ({len(times) / wall:.1f} puzzles/s)")
+    print(f"mean: {sum(times) / len(times) * 1000:.3f} ms  median: {times[len(times) // 2] * 1000:.3f} ms  max: {times[-1] * 1000:.3f} ms")
+    if args.cache:
+        print(f"solution cache hits: {sum(result.cached for result in results)}")
+    if args.portfolio:
+        print(f"p99: {times[min(len(times) - 1, round(0.99 * (len(times) - 1)))] * 1000:.3f} ms  "
+              f"timeouts: {sum(result.timed_out for result in results)}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m sudoku_cli", description="Headless Sudoku solver and generator.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve = commands.add_parser("solve", help="solve puzzle lines (81 characters, 256 for 16x16, 625 for 25x25) from a file or stdin")
+    solve.add_argument("input", nargs="?", help="puzzle file, one puzzle per line (default: stdin)")
+    solve.add_argument("--stats", action="store_true", help="write search statistics as one JSON line per puzzle to stderr")
+    solve.set_defaults(func=cmd_solve)
+
+    generate = commands.add_parser("generate", help="print randomly generated puzzles")
+    generate.add_argument("--difficulty", choices=DIFFICULTIES, default="Easy")
+    generate.add_argument("--count", type=int, default=1)
+    generate.add_argument("--seed", type=int, help="seed for reproducible output")
+    target = generate.add_mutually_exclusive_group()
+    target.add_argument("--score", type=float, nargs=2, metavar=("LOW", "HIGH"),
+                        help="target a technique rating score instead of the difficulty's clue range")
+    target.add_argument("--rated", action="store_true", help="target the rating score range of --difficulty")
+    generate.set_defaults(func=cmd_generate)
+
+    rate = commands.add_parser("rate", help="rate puzzles by the hardest solving technique they need")
+    rate.add_argument("input", nargs="?", help="puzzle file, one puzzle per line (default: stdin)")
+    rate.add_argument("--stats", action="store_true", help="write the deductions per technique as JSON lines to stderr")
+    rate.set_defaults(func=cmd_rate)
+
+    pipeline = commands.add_parser("pipeline", help="stream graded puzzles from a multi-process generation pipeline")
+    pipeline.add_argument("--difficulty", choices=DIFFICULTIES, default="Hard", help="rating tier of the puzzles")
+    pipeline.add_argument("--count", type=int, help="stop after this many puzzles (default: run until interrupted)")
+    pipeline.add_argument("--output", help="puzzle file to write (default: stdout)")
+    pipeline.add_argument("--seed", type=int, help="seed for reproducible output")
+    pipeline.add_argument("--workers", type=int, help="worker processes over all stages (default: one per CPU, at least 4)")
+    pipeline.add_argument("--queue-size", type=int, default=64, help="boards buffered between two stages and in flight overall")
+    pipeline.add_argument("--progress", type=float, default=10.0, help="seconds between stage statistics on stderr")
+    pipeline.set_defaults(func=cmd_pipeline)
+
+    bench = commands.add_parser("bench", help="time the solver on generated puzzles or a puzzle file")
+    bench.add_argument("input", nargs="?", help="puzzle file (default: generate --count puzzles)")
+    bench.add_argument("--difficulty", choices=DIFFICULTIES, default="Hard")
+    bench.add_argument("--count", type=int, default=100)
+    bench.set_defaults(func=cmd_bench)
+
+    for command in (generate, pipeline, bench):
+        command.add_argument("--size", type=int, choices=[9, 16, 25], default=9, help="board side (default: 9)")
+
+    for command in (solve, bench):
+        command.add_argument("--engine", choices=["bitmask", "dlx", "backtracking", "vector"], default="bitmask",
+                             help="vector: numpy batch propagation per chunk, bitmask search for the rest")
+        command.add_argument("--order", choices=["natural", "lcv", "random"], help="value ordering (default: engine's own)")
+        command.add_argument("--singles", action="store_true", help="also place hidden singles during propagation")
+        command.add_argument("--cache", action="store_true",
+                             help="reuse solutions of boards seen before, up to symmetry and digit relabeling")
+        command.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+        command.add_argument("--portfolio", action="store_true",
+                             help="race several engines and orderings per board in separate processes, first answer wins")
+        command.add_argument("--budget", type=float, help="with --portfolio, give up on a board after this many seconds")
+        command.add_argument("--chunk-size", type=int, default=64)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "portfolio", False) and args.workers != 1:
+        parser.error("--portfolio already races on every core, it cannot be combined with --workers")
+    try:
+        return args.func(args)
+    except ValueError as error:
+        # Malformed puzzle lines and boards an engine cannot take, meant for the shell rather than a traceback
+        sys.stdout.flush()
+        print(error, file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
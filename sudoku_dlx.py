@@ -0,0 +1,250 @@
+import time
+
+from sudoku_trace import NULL_TRACE, TRY_CELL, TRY_VALUE, AC_OK, CONFLICT, DEAD_END
+
+# Exact cover formulation: 729 candidate rows (cell, digit) and 324 constraint columns.
+# Column c in 0..80 is "cell c is filled", then one block of 81 columns each for
+# "row r has digit d", "column c has digit d" and "box b has digit d".
+CELL_COLUMN, ROW_COLUMN, COL_COLUMN, BOX_COLUMN = 0, 81, 162, 243
+NUM_COLUMNS = 324
+
+
+def row_columns(row, col, num):
+    box = 3 * (row // 3) + col // 3
+    d = num - 1
+    return (CELL_COLUMN + row * 9 + col, ROW_COLUMN + row * 9 + d, COL_COLUMN + col * 9 + d, BOX_COLUMN + box * 9 + d)
+
+
+def build_links():
+    # Node 0 is the root, nodes 1..324 the column headers (header of column c is node c + 1),
+    # then four nodes per candidate row. Links are plain int lists, so a solve copies five lists
+    # instead of allocating ~3000 node objects.
+    left = list(range(-1, NUM_COLUMNS))
+    right = list(range(1, NUM_COLUMNS + 2))
+    left[0], right[NUM_COLUMNS] = NUM_COLUMNS, 0
+    up = list(range(NUM_COLUMNS + 1))
+    down = list(range(NUM_COLUMNS + 1))
+    column = list(range(NUM_COLUMNS + 1))
+    row_of = [-1] * (NUM_COLUMNS + 1)
+    size = [0] * (NUM_COLUMNS + 1)
+    first = [0] * 729
+
+    for candidate in range(729):
+        cell, d = divmod(candidate, 9)
+        nodes = []
+        for c in row_columns(cell // 9, cell % 9, d + 1):
+            header = c + 1
+            node = len(column)
+            # Append at the bottom of the column
+            up.append(up[header])
+            down.append(header)
+            down[up[header]] = node
+            up[header] = node
+            column.append(header)
+            row_of.append(candidate)
+            size[header] += 1
+            nodes.append(node)
+        first[candidate] = nodes[0]
+        for k, node in enumerate(nodes):
+            left.append(nodes[k - 1])
+            right.append(nodes[(k + 1) % 4])
+    return left, right, up, down, column, row_of, size, first
+
+
+LINKS = build_links()
+
+
+class DlxMatrix:
+    __slots__ = ("left", "right", "up", "down", "column", "row_of", "size", "first", "solution", "trace", "stats")
+
+    def __init__(self, trace=NULL_TRACE, stats=None):
+        left, right, up, down, column, row_of, size, first = LINKS
+        # Only the mutable links are copied, column/row_of/first never change
+        self.left, self.right, self.up, self.down = left[:], right[:], up[:], down[:]
+        self.size = size[:]
+        self.column, self.row_of, self.first = column, row_of, first
+        self.solution = []
+        self.trace = trace
+        self.stats = stats
+
+    def cover(self, header):
+        # Unlinks the column and every row that uses it, returns how many rows were removed
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        removed = size[header]
+        i = down[header]
+        while i != header:
+            j = right[i]
+            while j != i:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+        return removed
+
+    def uncover(self, header):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[header]
+        while i != header:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def select(self, node):
+        # Covers the other columns of the row containing node, returns (rows removed, columns covered)
+        removed = covered = 0
+        j = self.right[node]
+        while j != node:
+            removed += self.cover(self.column[j])
+            covered += 1
+            j = self.right[j]
+        return removed, covered
+
+    def deselect(self, node):
+        j = self.left[node]
+        while j != node:
+            self.uncover(self.column[j])
+            j = self.left[j]
+
+    def load(self, board):
+        # Selects the rows of the givens, returns False if two givens compete for a constraint
+        right, column = self.right, self.column
+        for row in range(9):
+            for col in range(9):
+                num = int(board[row][col])
+                if num == 0:
+                    continue
+                node = self.first[(row * 9 + col) * 9 + num - 1]
+                for header in (column[node], column[right[node]], column[right[right[node]]],
+                               column[self.left[node]]):
+                    if not self.is_uncovered(header):
+                        return False
+                self.cover(column[node])
+                self.select(node)
+                self.solution.append(self.row_of[node])
+        return True
+
+    def is_uncovered(self, header):
+        return self.right[self.left[header]] == header
+
+    def choose_column(self):
+        # Column with the fewest remaining rows (the exact cover version of MRV), or 0 if all are covered
+        right, size = self.right, self.size
+        best, best_size = 0, 730
+        c = right[0]
+        while c != 0:
+            if size[c] < best_size:
+                best, best_size = c, size[c]
+                if best_size <= 1:
+                    break
+            c = right[c]
+        return best
+
+    def to_board(self):
+        board = [[0] * 9 for _ in range(9)]
+        for candidate in self.solution:
+            cell, d = divmod(candidate, 9)
+            board[cell // 9][cell % 9] = d + 1
+        return board
+
+
+def dlx_search(matrix, depth=0):
+    stats = matrix.stats
+    if stats is not None:
+        stats.max_depth = max(stats.max_depth, depth)
+        start = time.perf_counter()
+        header = matrix.choose_column()
+        stats.mrv_time += time.perf_counter() - start
+    else:
+        header = matrix.choose_column()
+    if header == 0:
+        return True
+    if matrix.size[header] == 0:
+        return False
+
+    trace = matrix.trace
+    tracing = trace.enabled
+    down, solution = matrix.down, matrix.solution
+    if tracing:
+        candidates = []
+        node = down[header]
+        while node != header:
+            candidates.append(divmod(matrix.row_of[node], 9))
+            node = down[node]
+        # The column may be a row/column/box-digit constraint, the event names the first candidate's cell
+        first_cell = candidates[0][0]
+        trace.emit(TRY_CELL, first_cell // 9, first_cell % 9, [d + 1 for _, d in candidates])
+
+    matrix.cover(header)
+    if stats is not None:
+        stats.propagations += 1
+    node = down[header]
+    while node != header:
+        candidate = matrix.row_of[node]
+        solution.append(candidate)
+        if tracing:
+            cell, d = divmod(candidate, 9)
+            trace.emit(TRY_VALUE, cell // 9, cell % 9, d + 1)
+        if stats is not None:
+            stats.nodes += 1
+            start = time.perf_counter()
+            removed, covered = matrix.select(node)
+            stats.propagation_time += time.perf_counter() - start
+            stats.revisions += removed
+            stats.propagations += covered
+        else:
+            matrix.select(node)
+        if tracing:
+            trace.emit(AC_OK)
+        if dlx_search(matrix, depth + 1):
+            return True
+        if tracing:
+            trace.emit(CONFLICT, cell // 9, cell % 9, d + 1)
+        if stats is not None:
+            stats.backtracks += 1
+        matrix.deselect(node)
+        solution.pop()
+        node = down[node]
+    matrix.uncover(header)
+    if tracing:
+        trace.emit(DEAD_END, first_cell // 9, first_cell % 9)
+    return False
+
+
+def count_dlx_solutions(matrix, limit):
+    header = matrix.choose_column()
+    if header == 0:
+        return 1
+    down = matrix.down
+    count = 0
+    matrix.cover(header)
+    node = down[header]
+    while node != header and count < limit:
+        matrix.select(node)
+        count += count_dlx_solutions(matrix, limit - count)
+        matrix.deselect(node)
+        node = down[node]
+    matrix.uncover(header)
+    return count
+
+
+def count_solutions_dlx(board, limit=2):
+    matrix = DlxMatrix()
+    if not matrix.load(board):
+        return 0
+    return count_dlx_solutions(matrix, limit)
+
+
+def solve_with_dlx(initial_board, trace=NULL_TRACE, stats=None):
+    matrix = DlxMatrix(trace, stats)
+    if not matrix.load(initial_board) or not dlx_search(matrix):
+        return None
+    return matrix.to_board()
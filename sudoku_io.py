@@ -0,0 +1,102 @@
+import mmap
+import os
+
+# Text format: one puzzle per line, 81 digits in row order with 0 or . for blanks.
+# 4x4, 16x16 and 25x25 boards are lines of 16, 256 and 625 characters, values above 9 are
+# letters (A = 10, B = 11, ... P = 25).
+# Binary format (9x9 only): fixed-width 41-byte records, two cells per byte (high nibble first),
+# so record i starts at byte i * 41 and files can be memory-mapped and sliced.
+
+BINARY_RECORD_SIZE = 41
+NIBBLE_PAIRS = tuple((byte >> 4, byte & 0x0F) for byte in range(256))
+
+SYMBOLS = "0123456789ABCDEFGHIJKLMNOP"
+SYMBOL_VALUES = {ch: value for value, ch in enumerate(SYMBOLS)}
+SYMBOL_VALUES.update({ch.lower(): value for ch, value in SYMBOL_VALUES.items()})
+SYMBOL_VALUES["."] = 0
+# Board side for every line length other than 81
+LINE_SIZES = {size * size: size for size in (4, 16, 25)}
+
+
+def parse_puzzle_line(line):
+    line = line.strip()
+    if len(line) == 81:
+        if any(ch not in "0123456789." for ch in line):
+            raise ValueError(f"Invalid puzzle line: {line!r}")
+        return [[0 if ch == "." else ord(ch) - 48 for ch in line[r * 9:r * 9 + 9]] for r in range(9)]
+    size = LINE_SIZES.get(len(line))
+    if size is None or any(SYMBOL_VALUES.get(ch, size + 1) > size for ch in line):
+        raise ValueError(f"Invalid puzzle line: {line!r}")
+    values = [SYMBOL_VALUES[ch] for ch in line]
+    return [values[r * size:r * size + size] for r in range(size)]
+
+
+def format_puzzle_line(board):
+    if len(board) <= 9:
+        return "".join(str(int(num)) for row in board for num in row)
+    return "".join(SYMBOLS[int(num)] for row in board for num in row)
+
+
+def read_puzzles(source):
+    # source is a path or an open text file; boards are yielded one at a time. A malformed line
+    # raises ValueError("line N: invalid puzzle"), N counting from 1 over every line of the file.
+    if isinstance(source, (str, os.PathLike)):
+        with open(source) as file:
+            yield from read_puzzles(file)
+        return
+    for number, line in enumerate(source, 1):
+        if line.strip() and not line.startswith("#"):
+            try:
+                board = parse_puzzle_line(line)
+            except ValueError:
+                raise ValueError(f"line {number}: invalid puzzle") from None
+            yield board
+
+
+def write_puzzles(target, boards):
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "w") as file:
+            return write_puzzles(file, boards)
+    count = 0
+    for board in boards:
+        target.write(format_puzzle_line(board) + "\n")
+        count += 1
+    return count
+
+
+def pack_board(board):
+    if len(board) != 9:
+        raise ValueError("The binary puzzle format only holds 9x9 boards")
+    cells = [int(board[r][c]) for r in range(9) for c in range(9)] + [0]
+    return bytes((cells[i] << 4) | cells[i + 1] for i in range(0, 82, 2))
+
+
+def unpack_board(record):
+    cells = []
+    for byte in record:
+        cells.extend(NIBBLE_PAIRS[byte])
+    return [cells[r * 9:r * 9 + 9] for r in range(9)]
+
+
+def write_binary_puzzles(path, boards, append=False):
+    count = 0
+    with open(path, "ab" if append else "wb") as file:
+        for board in boards:
+            file.write(pack_board(board))
+            count += 1
+    return count
+
+
+def count_binary_puzzles(path):
+    return os.path.getsize(path) // BINARY_RECORD_SIZE
+
+
+def read_binary_puzzles(path, start=0, stop=None):
+    # Memory-mapped, so only the pages being decoded are resident; start/stop select a record range
+    total = count_binary_puzzles(path)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop:
+        return
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(start * BINARY_RECORD_SIZE, stop * BINARY_RECORD_SIZE, BINARY_RECORD_SIZE):
+            yield unpack_board(mapped[offset:offset + BINARY_RECORD_SIZE])
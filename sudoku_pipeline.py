@@ -0,0 +1,245 @@
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from sudoku import generate_full_grid, remove_rated_cells
+from sudoku_bitmask import count_solutions
+from sudoku_dlx import count_solutions_dlx
+from sudoku_io import format_puzzle_line
+from sudoku_rating import rate_puzzle, DIFFICULTY_SCORES
+
+# Graded puzzle generation as a pipeline of worker process pools connected by bounded queues:
+#   grid -> dig -> verify -> classify -> write
+# A stage whose output queue is full blocks, so a slow stage holds back the ones before it instead
+# of letting boards pile up in memory. The write stage runs in the calling process.
+# Every board carries the sequence number the grid stage gave it, and each stage seeds its
+# generator from (seed, number, stage), so a board does not depend on which worker handled it.
+# A rejected board moves on as (number, None), which lets the write stage put the puzzles back
+# in sequence order: a seeded run always writes the same puzzles in the same order. The grid stage
+# takes a slot of the `slots` semaphore for every board and the write stage gives it back once the
+# board is in order, so at most queue_size boards are in flight. One slow board cannot make the
+# boards behind it pile up in the reorder buffer, and no queue ever holds more than it can take.
+
+STAGES = ("grid", "dig", "verify", "classify", "write")
+# Per stage counters: boards processed, boards rejected, seconds spent working
+COUNTERS = ("processed", "rejected", "busy")
+
+# How often blocked workers check whether the pipeline is stopping
+POLL_INTERVAL = 0.1
+
+# low/high is the rating score range of the target difficulty
+PipelineConfig = namedtuple("PipelineConfig", ["size", "low", "high", "singles"])
+GradedPuzzle = namedtuple("GradedPuzzle", ["board", "score", "technique"])
+
+
+def make_grid(board, rng, config):
+    return generate_full_grid(rng, config.size).tolist()
+
+
+def dig(board, rng, config):
+    remove_rated_cells(board, config.high, rng, config.singles)
+    return board
+
+
+def verify(board, rng, config):
+    # Independent uniqueness check, with Dancing Links where it applies
+    if config.size == 9:
+        solutions = count_solutions_dlx(board)
+    else:
+        solutions = count_solutions(board, singles=config.singles)
+    return board if solutions == 1 else None
+
+
+def classify(board, rng, config):
+    # Digging stops at the top of the score range, boards that end up below it are dropped
+    rating = rate_puzzle(board)
+    if not config.low <= rating.score <= config.high:
+        return None
+    return GradedPuzzle(board, rating.score, rating.technique)
+
+
+STAGE_FUNCTIONS = {"grid": make_grid, "dig": dig, "verify": verify, "classify": classify}
+
+
+def stage_worker(stage, inbox, outbox, stopping, counters, sequence, slots, entropy, config):
+    # Runs one stage function until the pipeline stops. The grid stage has no inbox and produces
+    # boards for as long as its outbox takes them, numbering them from the shared sequence counter.
+    # Ctrl-C is handled by the calling process, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Items still buffered when the pipeline stops are dropped instead of blocking the exit
+    outbox.cancel_join_thread()
+    function = STAGE_FUNCTIONS[stage]
+    index = STAGES.index(stage)
+    base = index * len(COUNTERS)
+    while not stopping.is_set():
+        if inbox is None:
+            if not slots.acquire(timeout=POLL_INTERVAL):
+                continue
+            with sequence.get_lock():
+                number = sequence.value
+                sequence.value += 1
+            board = None
+        else:
+            try:
+                number, board = inbox.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        result = None
+        if board is not None or inbox is None:
+            start = time.perf_counter()
+            result = function(board, np.random.default_rng([entropy, number, index]), config)
+            busy = time.perf_counter() - start
+            with counters.get_lock():
+                counters[base] += 1
+                counters[base + 1] += result is None
+                counters[base + 2] += busy
+        while not stopping.is_set():
+            try:
+                outbox.put((number, result), timeout=POLL_INTERVAL)
+                break
+            except queue.Full:
+                continue
+
+
+def default_stage_workers(workers):
+    # Digging costs far more per board than the other stages, it gets every core the others leave.
+    # Every stage needs a worker, so fewer than 4 workers still start 4 processes.
+    light = max(1, workers // 8)
+    return {"grid": 1, "dig": max(1, workers - 1 - 2 * light), "verify": light, "classify": light}
+
+
+class GenerationPipeline:
+    # Streams graded puzzles of one difficulty tier (sudoku_rating.DIFFICULTY_SCORES). workers is the
+    # total number of worker processes (default: one per CPU, at least one per stage), stage_workers
+    # overrides the split per stage, queue_size bounds every queue between stages and the number of
+    # boards in flight. A seeded run yields the same puzzles in the same order whatever the number of workers.
+
+    def __init__(self, difficulty="Hard", size=9, workers=None, stage_workers=None, queue_size=64, seed=None):
+        low, high = DIFFICULTY_SCORES[difficulty]
+        self.config = PipelineConfig(size, low, high, size > 9)
+        self.stage_workers = default_stage_workers(workers or os.cpu_count() or 1)
+        self.stage_workers.update(stage_workers or {})
+        self.queue_size = queue_size
+        self.seed = seed
+        self.stopping = multiprocessing.Event()
+        self.counters = multiprocessing.Array("d", len(STAGES) * len(COUNTERS))
+        self.sequence = multiprocessing.Value("q")
+        self.slots = None
+        self.queues = []
+        self.workers = []
+        self.start_time = None
+
+    def start(self):
+        self.stopping.clear()
+        # One queue after every worker stage, the last one feeds the write stage
+        self.queues = [multiprocessing.Queue(self.queue_size) for _ in STAGE_FUNCTIONS]
+        self.sequence.value = 0
+        self.slots = multiprocessing.BoundedSemaphore(self.queue_size)
+        # Without a seed every run draws fresh entropy, shared by all the workers of this run
+        entropy = np.random.SeedSequence(self.seed).entropy
+        for index, stage in enumerate(STAGE_FUNCTIONS):
+            inbox = self.queues[index - 1] if index > 0 else None
+            for number in range(self.stage_workers[stage]):
+                process = multiprocessing.Process(target=stage_worker, name=f"pipeline-{stage}-{number}", daemon=True,
+                                                  args=(stage, inbox, self.queues[index], self.stopping, self.counters,
+                                                        self.sequence, self.slots, entropy, self.config))
+                process.start()
+                self.workers.append(process)
+        self.start_time = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        deadline = time.perf_counter() + 5
+        for process in self.workers:
+            process.join(timeout=max(0, deadline - time.perf_counter()))
+            # A dig in progress on a large board can take seconds, it is not worth waiting for
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.workers = []
+        for outbox in self.queues:
+            outbox.cancel_join_thread()
+            outbox.close()
+        self.queues = []
+
+    def results(self, count=None):
+        # Yields GradedPuzzle tuples in sequence order, up to count (default: forever). Boards that
+        # overtook an earlier one in the pipeline wait here until it arrives, at most queue_size of them.
+        outbox = self.queues[-1]
+        base = STAGES.index("write") * len(COUNTERS)
+        arrived = {}
+        following = 0
+        produced = 0
+        while count is None or produced < count:
+            if following not in arrived:
+                try:
+                    number, puzzle = outbox.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in self.workers):
+                        raise RuntimeError("Every pipeline worker has stopped")
+                    continue
+                arrived[number] = puzzle
+                continue
+            puzzle = arrived.pop(following)
+            following += 1
+            self.slots.release()
+            if puzzle is not None:
+                produced += 1
+                self.counters[base] += 1
+                yield puzzle
+
+    def write(self, target, count=None, progress=None, report=None):
+        # Writes puzzle lines to an open text file as they arrive, flushing after each one so the
+        # output can be consumed while the pipeline runs. report(stats) is called every progress seconds.
+        base = STAGES.index("write") * len(COUNTERS)
+        last_report = time.perf_counter()
+        written = 0
+        for puzzle in self.results(count):
+            start = time.perf_counter()
+            target.write(format_puzzle_line(puzzle.board) + "\n")
+            target.flush()
+            self.counters[base + 2] += time.perf_counter() - start
+            written += 1
+            if progress is not None and report is not None and start - last_report >= progress:
+                report(self.stats())
+                last_report = start
+        return written
+
+    def stats(self):
+        # Per stage: workers, boards processed and rejected, throughput (boards passed on per second
+        # of wall time), utilization (busy share of the stage's workers) and boards waiting in its outbox
+        elapsed = time.perf_counter() - self.start_time
+        counters = self.counters[:]
+        stats = {}
+        for index, stage in enumerate(STAGES):
+            processed, rejected, busy = counters[index * len(COUNTERS):(index + 1) * len(COUNTERS)]
+            workers = self.stage_workers.get(stage, 1)
+            try:
+                queued = self.queues[index].qsize() if index < len(self.queues) else 0
+            except NotImplementedError:
+                # qsize() is not available on macOS
+                queued = None
+            stats[stage] = {
+                "workers": workers,
+                "processed": int(processed),
+                "rejected": int(rejected),
+                "per_second": (processed - rejected) / elapsed if elapsed else 0.0,
+                "utilization": busy / (elapsed * workers) if elapsed else 0.0,
+                "queued": queued,
+            }
+        return stats
+
+
+def format_stats(stats):
+    lines = []
+    for stage, row in stats.items():
+        queued = f", {row['queued']} queued" if row["queued"] is not None else ""
+        lines.append(f"{stage:<9}{row['workers']:>3} workers {row['processed']:>9} done {row['rejected']:>7} rejected "
+                     f"{row['per_second']:>9.1f}/s {row['utilization']:>5.0%} busy{queued}")
+    return "\n".join(lines)
@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import deque
+
+from sudoku import generate_random_puzzle
+from sudoku_io import read_puzzles, write_puzzles
+from sudoku_rating import DIFFICULTY_SCORES
+
+
+class PuzzlePool:
+    # Pre-generated puzzles per difficulty. A background thread keeps every pool topped up to
+    # `watermark`, so serving a board is a deque pop instead of a generation on the caller's thread.
+    # With `path` set, unused puzzles are saved to <path>/<difficulty>.txt on stop() and reloaded on start().
+    # size is the board side of every puzzle in the pool (9, 16, 25), stored as board_size since size() counts a pool.
+    # With rated=True, puzzles are generated for the technique rating tier of their difficulty
+    # (sudoku_rating.DIFFICULTY_SCORES) instead of its clue range.
+
+    def __init__(self, difficulties=("Easy", "Moderate", "Hard"), watermark=10, path=None, seed=None, size=9,
+                 rated=False):
+        self.pools = {difficulty: deque() for difficulty in difficulties}
+        self.board_size = size
+        self.rated = rated
+        self.watermark = watermark
+        self.path = path
+        self.seed = seed
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.worker = None
+
+    def start(self):
+        if self.path is not None:
+            self.load()
+        self.stopping.clear()
+        self.worker = threading.Thread(target=self.refill, name="puzzle-pool", daemon=True)
+        self.worker.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.worker is not None:
+            self.worker.join(timeout=5)
+            self.worker = None
+        if self.path is not None:
+            self.save()
+
+    def get(self, difficulty, block=True):
+        # With block=False an empty pool returns None instead of generating on the caller's thread,
+        # which takes seconds for 16x16 and 25x25 boards. Callers poll again until a board is ready.
+        # A rated pool can return None with block=True too, when generate() finds no board in its tier.
+        pool = self.pools[difficulty]
+        self.wakeup.set()
+        try:
+            return pool.popleft()
+        except IndexError:
+            if not block:
+                return None
+            # Pool drained faster than the worker refills it, generate this one directly
+            return self.generate(difficulty)
+
+    def size(self, difficulty):
+        return len(self.pools[difficulty])
+
+    def most_needed(self):
+        difficulty = min(self.pools, key=lambda name: len(self.pools[name]))
+        return difficulty if len(self.pools[difficulty]) < self.watermark else None
+
+    def refill(self):
+        import numpy as np
+
+        # The worker owns its own generator so seeded pools are reproducible
+        rng = np.random.default_rng(self.seed)
+        while not self.stopping.is_set():
+            difficulty = self.most_needed()
+            if difficulty is None:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            board = self.generate(difficulty, rng)
+            if board is not None:
+                self.pools[difficulty].append(board)
+
+    def generate(self, difficulty, rng=None):
+        score = DIFFICULTY_SCORES[difficulty] if self.rated else None
+        return generate_random_puzzle(difficulty, rng, self.board_size, score)
+
+    def pool_file(self, difficulty):
+        return os.path.join(self.path, f"{difficulty.lower()}.txt")
+
+    def load(self):
+        for difficulty, pool in self.pools.items():
+            if os.path.exists(self.pool_file(difficulty)):
+                pool.extend(read_puzzles(self.pool_file(difficulty)))
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        for difficulty, pool in self.pools.items():
+            write_puzzles(self.pool_file(difficulty), list(pool))
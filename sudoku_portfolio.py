@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from multiprocessing.connection import wait
+
+from sudoku_bitmask import Solver
+from sudoku_stats import SearchStats
+
+# Portfolio solving: several solver configurations race on the same board in separate processes,
+# the first one to finish wins and the others are killed. Different orderings and engines have
+# their slow boards in different places, so the race cuts the latency tail on multi-core machines.
+
+# engine and order as for solve_board. seed makes "random" orders reproducible. restarts=True
+# (bitmask only) reruns the random-order search with a fresh ordering after a node limit that
+# grows every restart, so one unlucky ordering cannot stall it.
+Strategy = namedtuple("Strategy", ["engine", "order", "singles", "seed", "restarts"],
+                      defaults=[None, False, None, False])
+
+DEFAULT_PORTFOLIO = (
+    Strategy("dlx"),
+    Strategy("bitmask", "lcv", True),
+    Strategy("bitmask", "natural"),
+    Strategy("bitmask", "random", True, seed=1, restarts=True),
+    Strategy("bitmask", "random", False, seed=2, restarts=True),
+)
+
+# Most boards need only a few search nodes, those are solved in process before any race starts.
+# 200 nodes take about as long as starting one racer process.
+HEAD_START_NODES = 200
+# Node limit of the first restart, each restart allows RESTART_GROWTH times more
+RESTART_NODES = 100
+RESTART_GROWTH = 1.5
+
+# solution is None when the board is unsolvable or timed_out is set. strategy is the winner, None
+# for a head start solve. stats is the winner's SearchStats.
+PortfolioResult = namedtuple("PortfolioResult", ["solution", "strategy", "elapsed", "timed_out", "stats"])
+
+# fork starts a racer in a few milliseconds, other platforms use their default start method
+CONTEXT = multiprocessing.get_context("fork" if sys.platform.startswith("linux") else None)
+
+
+def solve_with_restarts(board, strategy, stats):
+    rng = random.Random(strategy.seed)
+    solver = Solver(strategy.order or "random", strategy.singles, rng, len(board))
+    limit = RESTART_NODES
+    while True:
+        solution = solver.solve(board, stats=stats, max_nodes=limit)
+        if not solver.cutoff:
+            return solution
+        limit = int(limit * RESTART_GROWTH)
+
+
+def run_strategy(board, strategy, connection):
+    # Racer process: solves the board and sends (solution, stats) back
+    from sudoku import solve_board
+
+    stats = SearchStats()
+    start = time.perf_counter()
+    if strategy.seed is not None:
+        # The backtracking engine shuffles with the global generator
+        random.seed(strategy.seed)
+    if strategy.restarts:
+        solution = solve_with_restarts(board, strategy, stats)
+    elif strategy.engine == "bitmask" and strategy.seed is not None:
+        solution = Solver(strategy.order or "lcv", strategy.singles, random.Random(strategy.seed),
+                          len(board)).solve(board, stats=stats)
+    else:
+        solution = solve_board(board, strategy.engine, stats=stats, order=strategy.order, singles=strategy.singles)
+    stats.total_time = time.perf_counter() - start
+    connection.send((solution, stats.as_dict()))
+    connection.close()
+
+
+def race(board, strategies=DEFAULT_PORTFOLIO, budget=None, head_start=HEAD_START_NODES, workers=None):
+    # Returns a PortfolioResult. budget is a time limit in seconds for the whole solve, after it
+    # every racer is killed and the result has timed_out set. Racers that would share a core only
+    # slow each other down, so only the first `workers` strategies race (default: one per CPU).
+    start = time.perf_counter()
+    board = [[int(num) for num in row] for row in board]
+    if head_start:
+        stats = SearchStats()
+        solver = Solver("lcv", True, size=len(board))
+        solution = solver.solve(board, stats=stats, max_nodes=head_start)
+        if not solver.cutoff:
+            return PortfolioResult(solution, None, time.perf_counter() - start, False, stats)
+
+    for strategy in strategies:
+        if strategy.restarts and strategy.engine != "bitmask":
+            raise ValueError(f"Restarts need the bitmask engine, not {strategy.engine}")
+    # dlx only takes 9x9 boards, the rest of the portfolio races without it
+    strategies = [strategy for strategy in strategies if strategy.engine != "dlx" or len(board) == 9]
+    strategies = strategies[:workers or os.cpu_count() or 1]
+    racers = {}
+    pending = []
+
+    def answer(ready):
+        # PortfolioResult of the first ready racer with an answer, racers that died are dropped
+        for receiver in ready:
+            try:
+                solution, stats = receiver.recv()
+            except EOFError:
+                pending.remove(receiver)
+                continue
+            return PortfolioResult(solution, racers[receiver][1], time.perf_counter() - start, False,
+                                   SearchStats.from_dict(stats))
+        return None
+
+    try:
+        for strategy in strategies:
+            receiver, sender = CONTEXT.Pipe(duplex=False)
+            process = CONTEXT.Process(target=run_strategy, args=(board, strategy, sender), daemon=True)
+            process.start()
+            sender.close()
+            racers[receiver] = (process, strategy)
+            pending.append(receiver)
+            # Starting a process takes a few milliseconds, a fast racer can finish before the last one starts
+            result = answer(wait(pending, 0))
+            if result is not None:
+                return result
+
+        while pending:
+            timeout = None
+            if budget is not None:
+                timeout = budget - (time.perf_counter() - start)
+                if timeout <= 0:
+                    break
+            ready = wait(pending, timeout)
+            if not ready:
+                break
+            result = answer(ready)
+            if result is not None:
+                return result
+        if not pending:
+            raise RuntimeError("Every portfolio strategy failed")
+        return PortfolioResult(None, None, time.perf_counter() - start, True, None)
+    finally:
+        for receiver, (process, strategy) in racers.items():
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
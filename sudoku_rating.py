@@ -0,0 +1,313 @@
+import threading
+from collections import namedtuple
+
+from sudoku_bitmask import get_mask_tables
+from sudoku_utils import board_geometry
+
+# Human-style difficulty rating. A puzzle is solved with a ladder of logical techniques, always
+# using the easiest one that still makes progress, and rated by the hardest technique it needed.
+# Since every technique only removes candidates, the hardest one needed does not depend on the
+# order deductions are made in, so each technique applies everything it finds in one pass.
+
+# (technique, score) from easiest to hardest, scores on the Sudoku Explainer scale
+TECHNIQUES = (
+    ("Hidden Single", 1.5),
+    ("Naked Single", 2.3),
+    ("Pointing", 2.6),
+    ("Claiming", 2.8),
+    ("Naked Pair", 3.0),
+    ("X-Wing", 3.2),
+    ("Hidden Pair", 3.4),
+    ("Naked Triple", 3.6),
+    ("Swordfish", 3.8),
+    ("Hidden Triple", 4.0),
+    ("Naked Quad", 5.0),
+    ("Jellyfish", 5.2),
+    ("Hidden Quad", 5.4),
+)
+SCORES = dict(TECHNIQUES)
+# Puzzles the ladder cannot finish need guessing
+TRIAL_AND_ERROR = "Trial and Error"
+SCORES[TRIAL_AND_ERROR] = 10.0
+
+# Score ranges of the difficulty tiers, for sorting rated puzzles
+DIFFICULTY_SCORES = {"Easy": (1.0, 1.5), "Moderate": (2.0, 2.8), "Hard": (3.0, 10.0)}
+
+# technique is the hardest technique needed and score its score, steps counts the deductions made
+# with each technique. solved is False when the ladder got stuck (technique is then Trial and Error).
+Rating = namedtuple("Rating", ["technique", "score", "steps", "solved"])
+
+
+def difficulty_of(score):
+    for difficulty, (low, high) in DIFFICULTY_SCORES.items():
+        if low <= score <= high:
+            return difficulty
+    return None
+
+
+class Rater:
+    # Reusable rater for one board size. Candidates are bitmasks as in sudoku_bitmask, a placed cell
+    # has no candidates left and its digit is recorded in the used mask of its three units.
+    __slots__ = ("size", "all_digits", "peers", "units", "units_of", "row_units", "col_units", "intersections",
+                 "popcount", "mask_digits", "ladder", "cells", "candidates", "used", "placed", "steps", "places")
+
+    def __init__(self, size=9):
+        geometry = board_geometry(size)
+        self.size = size
+        self.all_digits = (1 << size) - 1
+        self.peers, self.units, self.units_of = geometry.peers, geometry.units, geometry.units_of
+        self.row_units, self.col_units = geometry.row_units, geometry.col_units
+        self.popcount, self.mask_digits = get_mask_tables(size)
+        # (box and line cells, rest of the line, rest of the box) for every box and every row/column crossing it
+        self.intersections = []
+        for box in geometry.box_units:
+            for lines in (geometry.row_units, geometry.col_units):
+                for line in lines:
+                    segment = tuple(cell for cell in line if cell in box)
+                    if segment:
+                        self.intersections.append((segment, tuple(cell for cell in line if cell not in box),
+                                                   tuple(cell for cell in box if cell not in segment)))
+        # The techniques above singles in TECHNIQUES order, each returns the number of cells it narrowed
+        self.ladder = (self.pointing, self.claiming, lambda: self.naked_subsets(2), lambda: self.fish(2),
+                       lambda: self.hidden_subsets(2), lambda: self.naked_subsets(3), lambda: self.fish(3),
+                       lambda: self.hidden_subsets(3), lambda: self.naked_subsets(4), lambda: self.fish(4),
+                       lambda: self.hidden_subsets(4))
+        self.cells = [0] * geometry.cell_count
+        self.candidates = [0] * geometry.cell_count
+        self.used = [0] * len(self.units)
+        self.placed = 0
+        self.steps = {}
+        self.places = None
+
+    def load(self, board):
+        # Returns False if the givens conflict with each other
+        if len(board) != self.size:
+            raise ValueError(f"Expected a {self.size}x{self.size} board, got {len(board)} rows")
+        size = self.size
+        self.cells[:] = (0,) * len(self.cells)
+        self.candidates[:] = (self.all_digits,) * len(self.cells)
+        self.used[:] = (0,) * len(self.units)
+        self.placed = 0
+        self.steps = {}
+        for i in range(len(self.cells)):
+            num = int(board[i // size][i % size])
+            if num != 0:
+                if not self.candidates[i] & (1 << (num - 1)):
+                    return False
+                self.place(i, num)
+        return True
+
+    def place(self, idx, num):
+        bit = 1 << (num - 1)
+        candidates = self.candidates
+        self.cells[idx] = num
+        candidates[idx] = 0
+        for unit in self.units_of[idx]:
+            self.used[unit] |= bit
+        for peer in self.peers[idx]:
+            candidates[peer] &= ~bit
+        self.placed += 1
+
+    def count(self, technique, steps):
+        self.steps[technique] = self.steps.get(technique, 0) + steps
+
+    def rate(self, board):
+        # Returns a Rating, or None if the puzzle has no solution
+        if not self.load(board):
+            return None
+        hardest = 0
+        while True:
+            level = self.singles()
+            if level is None:
+                return None
+            hardest = max(hardest, level)
+            if self.placed == len(self.cells):
+                technique = TECHNIQUES[hardest][0]
+                return Rating(technique, SCORES[technique], self.steps, True)
+            # Techniques that find nothing leave the candidates alone, so the digit places are
+            # computed once for the whole pass
+            self.places = None
+            for level, technique in enumerate(self.ladder, 2):
+                removed = technique()
+                if removed:
+                    self.count(TECHNIQUES[level][0], removed)
+                    hardest = max(hardest, level)
+                    break
+            else:
+                return Rating(TRIAL_AND_ERROR, SCORES[TRIAL_AND_ERROR], self.steps, False)
+
+    def singles(self):
+        # Places hidden singles, and naked singles only when no hidden single is left, until neither
+        # is found. Returns the ladder level of the harder of the two that was used, None on a contradiction.
+        candidates, cells, units, used, all_digits = self.candidates, self.cells, self.units, self.used, self.all_digits
+        level = 0
+        while True:
+            found = 0
+            for index in range(len(units)):
+                if used[index] == all_digits:
+                    continue
+                unit = units[index]
+                once = twice = 0
+                for cell in unit:
+                    mask = candidates[cell]
+                    twice |= once & mask
+                    once |= mask
+                if once | used[index] != all_digits:
+                    return None
+                hidden = once & ~twice
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    for cell in unit:
+                        if candidates[cell] & bit:
+                            self.place(cell, bit.bit_length())
+                            found += 1
+                            break
+                    else:
+                        # Two hidden singles of this unit were in the same cell
+                        return None
+            if found:
+                self.count("Hidden Single", found)
+                continue
+
+            for i in range(len(cells)):
+                mask = candidates[i]
+                if mask & (mask - 1) == 0 and cells[i] == 0:
+                    if mask == 0:
+                        # An earlier single took the last digit of this cell
+                        return None
+                    self.place(i, mask.bit_length())
+                    found += 1
+            if not found:
+                return level
+            self.count("Naked Single", found)
+            level = 1
+
+    def pointing(self):
+        # A digit of a box confined to one row/column of it is removed from the rest of that line
+        return self.locked_candidates(1, 2)
+
+    def claiming(self):
+        # A digit of a line confined to one box is removed from the rest of that box
+        return self.locked_candidates(2, 1)
+
+    def locked_candidates(self, inside, outside):
+        candidates = self.candidates
+        removed = 0
+        for cells in self.intersections:
+            segment = 0
+            for cell in cells[0]:
+                segment |= candidates[cell]
+            if not segment:
+                continue
+            rest = 0
+            for cell in cells[outside]:
+                rest |= candidates[cell]
+            locked = segment & ~rest
+            if locked:
+                for cell in cells[inside]:
+                    if candidates[cell] & locked:
+                        candidates[cell] &= ~locked
+                        removed += 1
+        return removed
+
+    def subsets(self, masks, k):
+        # (members, union) for every k masks, each with 2..k bits, that together have exactly k bits.
+        # Partial picks whose union already has more than k bits are not extended.
+        popcount = self.popcount
+        pool = [i for i in range(len(masks)) if 2 <= popcount[masks[i]] <= k]
+        found = []
+        if len(pool) < k:
+            return found
+        stack = [(0, (), 0)]
+        while stack:
+            start, members, union = stack.pop()
+            for position in range(start, len(pool) - (k - len(members)) + 1):
+                i = pool[position]
+                grown = union | masks[i]
+                if popcount[grown] > k:
+                    continue
+                if len(members) == k - 1:
+                    if popcount[grown] == k:
+                        found.append((members + (i,), grown))
+                else:
+                    stack.append((position + 1, members + (i,), grown))
+        return found
+
+    def naked_subsets(self, k):
+        # k cells of a unit with only k digits between them: those digits leave the other cells of the unit
+        candidates = self.candidates
+        removed = 0
+        for unit in self.units:
+            for members, union in self.subsets([candidates[cell] for cell in unit], k):
+                for j, cell in enumerate(unit):
+                    if j not in members and candidates[cell] & union:
+                        candidates[cell] &= ~union
+                        removed += 1
+        return removed
+
+    def hidden_subsets(self, k):
+        # k digits of a unit that only fit in k cells: those cells lose every other digit
+        candidates = self.candidates
+        removed = 0
+        for unit, places in zip(self.units, self.unit_places()):
+            for members, union in self.subsets(places, k):
+                keep = 0
+                for digit in members:
+                    keep |= 1 << digit
+                for j, cell in enumerate(unit):
+                    if union >> j & 1 and candidates[cell] & ~keep:
+                        candidates[cell] &= keep
+                        removed += 1
+        return removed
+
+    def unit_places(self):
+        # For every unit, bit j of places[d] is set when the unit's j-th cell can still take digit d + 1
+        if self.places is None:
+            candidates, mask_digits, size = self.candidates, self.mask_digits, self.size
+            self.places = []
+            for unit in self.units:
+                places = [0] * (size + 1)
+                for j, cell in enumerate(unit):
+                    for digit in mask_digits[candidates[cell]]:
+                        places[digit] |= 1 << j
+                self.places.append(places[1:])
+        return self.places
+
+    def fish(self, k):
+        # X-Wing (k=2), Swordfish (3), Jellyfish (4): a digit confined to the same k columns in k rows is
+        # removed from those columns in every other row, and the same with rows and columns swapped
+        candidates = self.candidates
+        removed = 0
+        size = self.size
+        places = self.unit_places()
+        for bases, covers in ((places[:size], self.col_units), (places[size:2 * size], self.row_units)):
+            for digit in range(size):
+                bit = 1 << digit
+                for members, union in self.subsets([line[digit] for line in bases], k):
+                    for j in range(size):
+                        if union >> j & 1:
+                            for i, cell in enumerate(covers[j]):
+                                if i not in members and candidates[cell] & bit:
+                                    candidates[cell] &= ~bit
+                                    removed += 1
+        return removed
+
+
+# One rater per thread and board size, like the bitmask solvers
+raters = threading.local()
+
+
+def get_rater(size=9):
+    cache = getattr(raters, "cache", None)
+    if cache is None:
+        cache = raters.cache = {}
+    if size not in cache:
+        cache[size] = Rater(size)
+    return cache[size]
+
+
+def rate_puzzle(board):
+    # Rating of a puzzle with a unique solution, None if it has no solution.
+    # Puzzles with several solutions come out as Trial and Error.
+    return get_rater(len(board)).rate(board)
@@ -0,0 +1,71 @@
+import cProfile
+import io
+import pstats
+import tracemalloc
+
+
+class SearchStats:
+    # Counters and per-phase timings filled in by the solvers when a stats object is passed in.
+    #   nodes         values tried at search nodes
+    #   backtracks    tried values that were undone
+    #   propagations  cells processed by arc consistency / propagation (dlx: constraint columns covered)
+    #   revisions     domain values removed by propagation (dlx: candidate rows removed)
+    #   max_depth     deepest search level reached
+    FIELDS = ("nodes", "backtracks", "propagations", "revisions", "max_depth",
+              "mrv_time", "lcv_time", "propagation_time", "total_time")
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.propagations = 0
+        self.revisions = 0
+        self.max_depth = 0
+        self.mrv_time = 0.0
+        self.lcv_time = 0.0
+        self.propagation_time = 0.0
+        self.total_time = 0.0
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls()
+        for field in cls.FIELDS:
+            if field in values:
+                setattr(stats, field, values[field])
+        return stats
+
+    def summary_lines(self):
+        return [
+            f"Solved in {self.total_time:.3f} seconds",
+            f"Nodes: {self.nodes}  Backtracks: {self.backtracks}  Max depth: {self.max_depth}",
+            f"Propagations: {self.propagations}  Revisions: {self.revisions}",
+            f"MRV {self.mrv_time * 1000:.1f} ms  LCV {self.lcv_time * 1000:.1f} ms  "
+            f"Propagation {self.propagation_time * 1000:.1f} ms",
+        ]
+
+    def __repr__(self):
+        return "SearchStats(" + ", ".join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS) + ")"
+
+
+def profile_solve(solve, board, *args, sort="cumulative", limit=25):
+    # cProfile wrapper, returns the solution and the formatted pstats report
+    profiler = cProfile.Profile()
+    solution = profiler.runcall(solve, board, *args)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats(sort).print_stats(limit)
+    return solution, report.getvalue()
+
+
+def memory_solve(solve, board, *args):
+    # tracemalloc wrapper, returns the solution and the peak traced memory in bytes
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    solution = solve(board, *args)
+    peak = tracemalloc.get_traced_memory()[1]
+    if not already_tracing:
+        tracemalloc.stop()
+    return solution, peak
@@ -0,0 +1,76 @@
+import logging
+from collections import deque
+
+# Event codes, kept as small ints so a recorded event is just a short tuple
+TRY_CELL = 0        # row, col, domain values
+TRY_VALUE = 1       # row, col, value
+APPLY_AC = 2        # -
+AC_OK = 3           # -
+CONFLICT = 4        # row, col, value
+INVALID_VALUE = 5   # row, col, value
+DEAD_END = 6        # row, col
+PROCESS_CELL = 7    # row, col
+REVISE = 8          # row, col, removed values, source row, source col
+
+# Same wording as the solver's original per-step log lines
+TEXT_FORMATS = {
+    TRY_CELL: "Attempting to fill cell ({0}, {1}) with domain values: {2}",
+    TRY_VALUE: "Trying value {2} for cell ({0}, {1})",
+    APPLY_AC: "Applying Arc Consistency",
+    AC_OK: "Arc Consistency check is successful",
+    CONFLICT: "Value {2} for cell ({0}, {1}) leads to conflict. Backtracking...",
+    INVALID_VALUE: "Value {2} is not valid for cell ({0}, {1}). Skipping...",
+    DEAD_END: "No valid value found for cell ({0}, {1}). Backtracking...",
+    PROCESS_CELL: "=====================================================\nProcessing cell ({0}, {1})",
+    REVISE: "Revised: The values, {2}, are removed from ({0}, {1})'s domain the value due to ({3}, {4})",
+}
+
+
+def format_event(event):
+    return TEXT_FORMATS[event[0]].format(*event[1:])
+
+
+class TraceSink:
+    # Solvers check `enabled` before building an event, so a disabled sink costs one attribute read
+    enabled = True
+
+    def emit(self, code, *args):
+        raise NotImplementedError
+
+
+class NullTraceSink(TraceSink):
+    enabled = False
+
+    def emit(self, code, *args):
+        pass
+
+
+class RingBufferTraceSink(TraceSink):
+    # Keeps the last `capacity` events as (code, *args) tuples for on-demand explanations
+    def __init__(self, capacity=100000):
+        self.buffer = deque(maxlen=capacity)
+
+    def emit(self, code, *args):
+        self.buffer.append((code,) + args)
+
+    def events(self):
+        return list(self.buffer)
+
+    def lines(self):
+        return [format_event(event) for event in self.buffer]
+
+    def clear(self):
+        self.buffer.clear()
+
+
+class TextTraceSink(TraceSink):
+    # Writes events through logging, matching the format of sudoku_agent.log
+    def __init__(self, logger=None):
+        self.logger = logger if logger is not None else logging.getLogger()
+
+    def emit(self, code, *args):
+        for line in TEXT_FORMATS[code].format(*args).split("\n"):
+            self.logger.info(line)
+
+
+NULL_TRACE = NullTraceSink()
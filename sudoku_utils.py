@@ -1,26 +1,90 @@
+import math
+
+class Geometry:
+    # Precomputed index tables for a size x size board made of box x box boxes (size = box * box),
+    # shared by the solvers and validators. Cells are numbered in row order, units are the rows,
+    # then the columns, then the boxes.
+    def __init__(self, box):
+        size = box * box
+        cells = size * size
+        self.box = box
+        self.size = size
+        self.cell_count = cells
+        self.row_of = tuple(i // size for i in range(cells))
+        self.col_of = tuple(i % size for i in range(cells))
+        self.box_of = tuple(box * (i // (size * box)) + (i % size) // box for i in range(cells))
+        self.cells = tuple((self.row_of[i], self.col_of[i]) for i in range(cells))
+
+        self.row_units = tuple(tuple(range(r * size, r * size + size)) for r in range(size))
+        self.col_units = tuple(tuple(range(c, cells, size)) for c in range(size))
+        self.box_units = tuple(tuple(i for i in range(cells) if self.box_of[i] == b) for b in range(size))
+        self.units = self.row_units + self.col_units + self.box_units
+        # Indices into units of the row, column and box containing each cell
+        self.units_of = tuple((self.row_of[i], size + self.col_of[i], 2 * size + self.box_of[i]) for i in range(cells))
+
+        # The cells sharing a row, column or box with each cell, as flat indices and as (row, col) pairs
+        self.peers = tuple(
+            tuple(sorted(set(self.row_units[self.row_of[i]] + self.col_units[self.col_of[i]]
+                             + self.box_units[self.box_of[i]]) - {i}))
+            for i in range(cells)
+        )
+        self.peer_cells = tuple(tuple(self.cells[j] for j in self.peers[i]) for i in range(cells))
+
+        self.row_cells = tuple(tuple(self.cells[i] for i in unit) for unit in self.row_units)
+        self.col_cells = tuple(tuple(self.cells[i] for i in unit) for unit in self.col_units)
+        self.box_cells = tuple(tuple(self.cells[i] for i in unit) for unit in self.box_units)
+        self.unit_cells = self.row_cells + self.col_cells + self.box_cells
+
+geometries = {}
+
+def board_geometry(size):
+    # Tables for a size x size board, built once per size. size must be a square (4, 9, 16, 25, ...).
+    if size not in geometries:
+        box = math.isqrt(size)
+        if size < 4 or box * box != size:
+            raise ValueError(f"Unsupported board size: {size}x{size}")
+        geometries[size] = Geometry(box)
+    return geometries[size]
+
+# Tables of the classic 9x9 board, cells are numbered 0..80 in row order
+GEOMETRY_9 = board_geometry(9)
+ROW_OF = GEOMETRY_9.row_of
+COL_OF = GEOMETRY_9.col_of
+BOX_OF = GEOMETRY_9.box_of
+CELLS = GEOMETRY_9.cells
+
+ROW_UNITS = GEOMETRY_9.row_units
+COL_UNITS = GEOMETRY_9.col_units
+BOX_UNITS = GEOMETRY_9.box_units
+UNITS = GEOMETRY_9.units
+UNITS_OF = GEOMETRY_9.units_of
+
+PEERS = GEOMETRY_9.peers
+PEER_CELLS = GEOMETRY_9.peer_cells
+
+ROW_CELLS = GEOMETRY_9.row_cells
+COL_CELLS = GEOMETRY_9.col_cells
+BOX_CELLS = GEOMETRY_9.box_cells
+UNIT_CELLS = GEOMETRY_9.unit_cells
+
 def print_board(board):
     for row in board:
         print(" ".join(map(str, row)))
 
 def is_valid_move(board, row, col, num):
-    if num in board[row]:   # Check same row
+    if board[row][col] == num:
         return False
-    
-    if num in [board[i][col] for i in range(9)]:    # Check same column
-        return False
-    
-    subgrid_row, subgrid_col = 3 * (row // 3), 3 * (col // 3)   # Check the 9x9 grid
-    for i in range(subgrid_row, subgrid_row + 3):
-        for j in range(subgrid_col, subgrid_col + 3):
-            if board[i][j] == num:
-                return False
+    size = len(board)
+    for i, j in board_geometry(size).peer_cells[row * size + col]:  # Check same row, column and box
+        if board[i][j] == num:
+            return False
     return True
 
 def is_empty_cell(board, domains):
     min_remaining_values = float('inf')
     selected_cell = None
-    for i in range(9):
-        for j in range(9):
+    for i in range(len(board)):
+        for j in range(len(board)):
             if board[i][j] == 0:
                 remaining_values = len(domains[i][j])
                 if remaining_values < min_remaining_values:
@@ -29,63 +93,86 @@ def is_empty_cell(board, domains):
     return selected_cell
 
 def get_domain_values(board, row, col):
-    domain_values = [num for num in range(1, 10) if is_valid_move(board, row, col, num)]
+    domain_values = [num for num in range(1, len(board) + 1) if is_valid_move(board, row, col, num)]
     return domain_values
 
 def is_valid_sudoku(board):
-    def is_valid_row(board, row):
-        is_found = set()
-        for num in board[row]:
-            if num != 0:
-                if num in is_found:
-                    return False
-                is_found.add(num)
-        return True
-
-    def is_valid_column(board, col):
+    # No digit may repeat in any row, column or box
+    for unit in board_geometry(len(board)).unit_cells:
         seen = set()
-        for row in range(9):
+        for row, col in unit:
             num = board[row][col]
             if num != 0:
                 if num in seen:
                     return False
                 seen.add(num)
-        return True
-
-    def is_valid_subgrid(board, start_row, start_col):
-        seen = set()
-        for row in range(start_row, start_row + 3):
-            for col in range(start_col, start_col + 3):
-                num = board[row][col]
-                if num != 0:
-                    if num in seen:
-                        return False
-                    seen.add(num)
-        return True
-
-    for i in range(9):
-        if not is_valid_row(board, i) or not is_valid_column(board, i):
-            return False
-
-    for i in range(0, 9, 3):
-        for j in range(0, 9, 3):
-            if not is_valid_subgrid(board, i, j):
-                return False
-
     return True
 
-def get_filled_cells_range(difficulty):
-    if difficulty == "Easy":
-        return 36, 45
-    elif difficulty == "Moderate":
-        return 27, 35
-    elif difficulty == "Hard":
-        return 17, 26
-    else:
-        return 0, 81 
+# Given-cell ranges per difficulty. Larger boards need a bigger share of givens: random removal
+# rarely gets a 16x16 board below ~95 givens (37%) or a 25x25 board below ~310 (50%) while keeping
+# the solution unique, and the uniqueness checks get very slow near those limits.
+FILLED_CELLS_RANGES = {
+    9: {"Easy": (36, 45), "Moderate": (27, 35), "Hard": (17, 26)},
+    16: {"Easy": (128, 144), "Moderate": (112, 127), "Hard": (98, 111)},
+    25: {"Easy": (390, 420), "Moderate": (360, 389), "Hard": (330, 359)},
+}
+
+def get_filled_cells_range(difficulty, size=9):
+    if difficulty not in FILLED_CELLS_RANGES[9]:
+        return 0, size * size
+    if size in FILLED_CELLS_RANGES:
+        return FILLED_CELLS_RANGES[size][difficulty]
+    # Other sizes keep the same share of given cells as the 9x9 ranges
+    low, high = FILLED_CELLS_RANGES[9][difficulty]
+    cells = size * size
+    return round(low * cells / 81), round(high * cells / 81)
 
 def is_board_complete(grid):
     for row in grid:
         if 0 in row:
             return False
-    return is_valid_sudoku(grid)
\ No newline at end of file
+    return is_valid_sudoku(grid)
+
+class UnitCounters:
+    # Digit counts for every row, column and box of a board, updated in O(1) per cell edit, so
+    # validity and completeness never need a full rescan of the units.
+    def __init__(self, board):
+        self.size = len(board)
+        self.geometry = board_geometry(self.size)
+        self.values = [0] * self.geometry.cell_count
+        self.counts = [[0] * (self.size + 1) for _ in range(len(self.geometry.units))]
+        self.filled = 0
+        self.duplicates = 0  # (unit, digit) pairs that occur more than once
+        for row in range(self.size):
+            for col in range(self.size):
+                self.set(row, col, board[row][col])
+
+    def set(self, row, col, num):
+        # Returns True if the cell changed
+        idx = row * self.size + col
+        old = self.values[idx]
+        if old == num:
+            return False
+        if old:
+            self.filled -= 1
+            for unit in self.geometry.units_of[idx]:
+                self.counts[unit][old] -= 1
+                if self.counts[unit][old] == 1:
+                    self.duplicates -= 1
+        if num:
+            self.filled += 1
+            for unit in self.geometry.units_of[idx]:
+                self.counts[unit][num] += 1
+                if self.counts[unit][num] == 2:
+                    self.duplicates += 1
+        self.values[idx] = num
+        return True
+
+    def count(self, unit, num):
+        return self.counts[unit][num]
+
+    def is_valid(self):
+        return self.duplicates == 0
+
+    def is_complete(self):
+        return self.filled == self.geometry.cell_count and self.duplicates == 0
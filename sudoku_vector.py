@@ -0,0 +1,106 @@
+import numpy as np
+
+from sudoku_utils import PEERS, UNITS, UNITS_OF
+
+# Batched propagation: N boards are held as an (N, 81) array of 9-bit candidate masks and every
+# elimination / single-detection step runs on all of them at once. Boards that propagation does
+# not finish are handed to a per-board engine, starting from the cells propagation already fixed.
+
+ALL_DIGITS = 0x1FF
+DIGIT_BITS = (1 << np.arange(9)).astype(np.uint16)
+POPCOUNT = np.array([bin(mask).count("1") for mask in range(ALL_DIGITS + 1)], dtype=np.uint8)
+# Digit of a single-bit mask, 0 for any other mask
+MASK_DIGIT = np.zeros(ALL_DIGITS + 1, dtype=np.uint8)
+MASK_DIGIT[DIGIT_BITS] = np.arange(1, 10)
+
+PEER_INDEX = np.array(PEERS, dtype=np.intp)      # (81, 20)
+UNIT_INDEX = np.array(UNITS, dtype=np.intp)      # (27, 9)
+# For every cell, the index of each of its three units and its position inside that unit
+CELL_UNIT = np.array(UNITS_OF, dtype=np.intp)                                        # (81, 3)
+CELL_POSITION = np.array([[UNITS[unit].index(i) for unit in UNITS_OF[i]] for i in range(81)], dtype=np.intp)
+
+
+def boards_to_masks(boards):
+    grid = np.asarray(boards, dtype=np.int64).reshape(-1, 81)
+    masks = np.full(grid.shape, ALL_DIGITS, dtype=np.uint16)
+    given = grid > 0
+    masks[given] = DIGIT_BITS[grid[given] - 1]
+    return masks
+
+
+def masks_to_boards(masks):
+    # Cells that are not down to one candidate come out as 0
+    return MASK_DIGIT[masks].reshape(-1, 9, 9)
+
+
+def eliminate(masks):
+    # Removes the value of every decided cell from its peers. Returns the new masks and a per-board
+    # flag for boards where two peers hold the same single value.
+    single = POPCOUNT[masks] == 1
+    decided = np.where(single, masks, 0)
+    peer_values = np.bitwise_or.reduce(decided[:, PEER_INDEX], axis=2)
+    clash = (single & ((masks & peer_values) != 0)).any(axis=1)
+    return np.where(single, masks, masks & ~peer_values), clash
+
+
+def hidden_singles(masks):
+    # Narrows a cell to a digit when no other cell of one of its units can take that digit.
+    # Returns the new masks and a per-board flag for units where some digit has no cell left.
+    unit_masks = masks[:, UNIT_INDEX]                                           # (N, 27, 9)
+    has_digit = (unit_masks[..., None] & DIGIT_BITS) != 0                       # (N, 27, 9 cells, 9 digits)
+    places = has_digit.sum(axis=2)                                              # (N, 27, 9 digits)
+    missing = (places == 0).any(axis=(1, 2))
+    hidden = (np.where(places == 1, DIGIT_BITS, 0)).sum(axis=2).astype(np.uint16)   # (N, 27)
+    forced = unit_masks & hidden[..., None]                                     # (N, 27, 9)
+    # Two digits that can each only go in the same cell
+    missing |= (POPCOUNT[forced] > 1).any(axis=(1, 2))
+    forced = np.where(forced == 0, ALL_DIGITS, forced).astype(np.uint16)
+    # Each cell is narrowed by whatever its row, column and box force on it
+    narrow = np.bitwise_and.reduce(forced[:, CELL_UNIT, CELL_POSITION], axis=2)
+    return masks & narrow, missing
+
+
+def propagate_batch(boards, singles=True):
+    # Returns (masks, solved, failed) for a batch of 9x9 boards. failed marks boards proven unsolvable.
+    masks = boards_to_masks(boards)
+    failed = np.zeros(len(masks), dtype=bool)
+    active = np.arange(len(masks))
+    while len(active):
+        current = masks[active]
+        updated, clash = eliminate(current)
+        if singles:
+            updated, missing = hidden_singles(updated)
+            clash |= missing
+        clash |= (updated == 0).any(axis=1)
+        changed = (updated != current).any(axis=1)
+        masks[active] = updated
+        failed[active[clash]] = True
+        # Boards stop when they stop changing or hit a contradiction
+        active = active[changed & ~clash]
+    solved = (POPCOUNT[masks] == 1).all(axis=1) & ~failed
+    return masks, solved, failed
+
+
+def solve_batch(boards, engine="bitmask", stats=None, order=None, singles=False):
+    # Solves every board, returns a list with a solved 9x9 board or None per input board.
+    # Only boards left open by the vectorized phase are searched one by one with `engine`
+    # (order and singles apply to that search). stats can be a list of SearchStats, one per board.
+    from sudoku import solve_board
+
+    boards = list(boards)
+    if not boards:
+        return []
+    if any(len(board) != 9 for board in boards):
+        raise ValueError("The vector engine only solves 9x9 boards")
+    masks, solved, failed = propagate_batch(boards)
+    partial = masks_to_boards(masks).tolist()
+    results = []
+    for i in range(len(boards)):
+        if failed[i]:
+            results.append(None)
+        elif solved[i]:
+            results.append(partial[i])
+        else:
+            board_stats = stats[i] if stats is not None else None
+            results.append(solve_board(partial[i], engine, stats=board_stats, order=order, singles=singles))
+    return results
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from sudoku_cache import canonical_entry
+from sudoku_io import format_puzzle_line, parse_puzzle_line
+from sudoku_stats import SearchStats
+
+
+class SolveWorker:
+    # Runs one solve in a separate `python -m sudoku_cli solve` process. The pygame loop keeps
+    # redrawing while it searches (no GIL sharing), and cancel() kills the search outright.
+    # With a sudoku_cache.SolutionCache, a cached board or a symmetric variant of one finishes at once
+    # without starting a process, and every finished solve is stored in the cache. The canonical key
+    # takes a few milliseconds (tens at most, see sudoku_cache.MAX_CANDIDATES), far less than a process start.
+
+    def __init__(self, board, engine="bitmask", cache=None):
+        self.start_time = time.perf_counter()
+        self.elapsed = None
+        self.solution = None
+        self.stats = None
+        self.done = False
+        self.cancelled = False
+        self.from_cache = False
+        # stderr of a solve process that failed, as opposed to one that found the board unsolvable
+        self.error = None
+        self.board = [row[:] for row in board]
+        self.cache = cache
+        self.process = None
+        # (key, transform) the board is cached under, kept for store() once the solve is done
+        self.entry = None
+        if cache is not None:
+            found, solution = cache.lookup_exact(board)
+            if not found:
+                self.entry = canonical_entry(board, cache.canonical)
+                found, solution = cache.lookup_canonical(board, *self.entry)
+            if found:
+                self.solution = solution
+                self.elapsed = time.perf_counter() - self.start_time
+                self.from_cache = True
+                self.done = True
+                return
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "sudoku_cli", "solve", "--engine", engine, "--stats"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        self.process.stdin.write(format_puzzle_line(board) + "\n")
+        self.process.stdin.close()
+
+    def running_time(self):
+        return time.perf_counter() - self.start_time if self.elapsed is None else self.elapsed
+
+    def poll(self):
+        # Non-blocking, returns True once the solve has finished or was cancelled
+        if self.done:
+            return True
+        if self.process.poll() is None:
+            return False
+        self.elapsed = time.perf_counter() - self.start_time
+        output = self.process.stdout.read().strip()
+        errors = self.process.stderr.read()
+        self.process.stdout.close()
+        self.process.stderr.close()
+        # sudoku_cli solve exits with 0 on a solution and 1 on an unsolvable board, anything else
+        # (a traceback also exits with 1) means the solver itself failed
+        if self.process.returncode == 0 and output:
+            self.solution = parse_puzzle_line(output)
+        elif self.process.returncode != 1 or output != "unsolvable":
+            self.error = "\n".join(line for line in errors.splitlines() if not line.startswith("{")).strip()
+            self.error = self.error or f"exit code {self.process.returncode}"
+            output = ""
+        # sudoku_cli solve --stats writes one JSON line of search statistics to stderr
+        for line in errors.splitlines():
+            if line.startswith("{"):
+                self.stats = SearchStats.from_dict(json.loads(line))
+        if self.cache is not None and output:
+            self.cache.store(self.board, self.solution, self.entry)
+        self.done = True
+        return True
+
+    def cancel(self):
+        if not self.done:
+            self.process.kill()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process.stderr.close()
+            self.elapsed = time.perf_counter() - self.start_time
+            self.cancelled = True
+            self.done = True
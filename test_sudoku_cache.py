@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from sudoku import generate_random_puzzle, solve_board
+from sudoku_cache import SolutionCache, canonical_form, from_canonical, to_canonical
+
+
+def random_symmetry(board, rng):
+    # Applies a random member of the symmetry group canonical_form works with
+    grid = np.asarray(board)
+    digits = np.concatenate([[0], rng.permutation(9) + 1])
+    rows = [3 * band + r for band in rng.permutation(3) for r in rng.permutation(3)]
+    cols = [3 * stack + c for stack in rng.permutation(3) for c in rng.permutation(3)]
+    grid = digits[grid[np.ix_(rows, cols)]]
+    if rng.integers(2):
+        grid = grid.T
+    return grid.tolist()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_canonical_round_trip(seed):
+    rng = np.random.default_rng(seed)
+    board = generate_random_puzzle(["Easy", "Moderate", "Hard"][seed % 3], rng).tolist()
+    variant = random_symmetry(board, rng)
+
+    key, transform = canonical_form(board)
+    variant_key, variant_transform = canonical_form(variant)
+    assert transform is not None
+    assert key == variant_key
+    assert from_canonical(to_canonical(board, transform), transform) == board
+
+    # A solution filed under one board maps onto the solution of its variant
+    solution = solve_board(board)
+    assert from_canonical(to_canonical(solution, transform), variant_transform) == solve_board(variant)
+
+
+def test_cache_serves_symmetric_variant():
+    rng = np.random.default_rng(7)
+    board = generate_random_puzzle("Hard", rng).tolist()
+    variant = random_symmetry(board, rng)
+    cache = SolutionCache()
+    cache.store(board, solve_board(board))
+    assert cache.lookup_exact(variant) == (False, None)
+    assert cache.lookup(variant) == (True, solve_board(variant))
+
+
+def test_many_tied_transforms_use_plain_key():
+    board = [[0] * 9 for _ in range(9)]
+    board[4][4] = 5
+    key, transform = canonical_form(board)
+    assert transform is None
+    assert key == "".join(str(num) for row in board for num in row)
@@ -0,0 +1,39 @@
+import pytest
+
+from sudoku import solve_board
+from sudoku_bench import HARD_17_CLUE
+from sudoku_io import parse_puzzle_line
+from sudoku_utils import is_board_complete
+from sudoku_vector import solve_batch
+
+PUZZLES = [parse_puzzle_line(line) for line in HARD_17_CLUE[:5]] + [
+    parse_puzzle_line("530070000600195000098000060800060003400803001700020006060000280000419005000080079"),
+]
+UNSOLVABLE = parse_puzzle_line("550070000600195000098000060800060003400803001700020006060000280000419005000080079")
+
+
+@pytest.mark.parametrize("board", PUZZLES)
+def test_dlx_matches_bitmask(board):
+    expected = solve_board(board)
+    assert is_board_complete(expected)
+    assert solve_board(board, "dlx") == expected
+
+
+# The list-domain solver needs seconds on 17-clue puzzles, one of them is enough
+@pytest.mark.parametrize("board", [PUZZLES[0], PUZZLES[-1]])
+def test_backtracking_matches_bitmask(board):
+    assert solve_board(board, "backtracking") == solve_board(board)
+
+
+# The vector engine only solves batches, not single boards through solve_board
+def test_vector_batch_matches_bitmask():
+    assert solve_batch(PUZZLES) == [solve_board(board) for board in PUZZLES]
+
+
+@pytest.mark.parametrize("engine", ["bitmask", "dlx", "backtracking"])
+def test_conflicting_givens_are_unsolvable(engine):
+    assert solve_board(UNSOLVABLE, engine) is None
+
+
+def test_vector_batch_marks_unsolvable():
+    assert solve_batch([PUZZLES[0], UNSOLVABLE]) == [solve_board(PUZZLES[0]), None]
@@ -0,0 +1,70 @@
+import io
+
+import numpy as np
+import pytest
+
+from sudoku import generate_full_grid
+from sudoku_io import (format_puzzle_line, parse_puzzle_line, read_puzzles, write_puzzles, pack_board, unpack_board,
+                       write_binary_puzzles, read_binary_puzzles, count_binary_puzzles)
+
+
+def boards_of(size, count, seed=0):
+    # Solution grids with about half the cells blanked, the formats do not care about uniqueness
+    rng = np.random.default_rng(seed)
+    return [np.where(rng.random((size, size)) < 0.5, 0, generate_full_grid(rng, size)).tolist() for _ in range(count)]
+
+
+@pytest.mark.parametrize("size", [9, 16])
+def test_text_round_trip(size):
+    boards = boards_of(size, 5)
+    stream = io.StringIO()
+    assert write_puzzles(stream, boards) == 5
+    stream.seek(0)
+    assert list(read_puzzles(stream)) == boards
+
+
+def test_16x16_values_above_nine_are_letters():
+    board = boards_of(16, 1)[0]
+    line = format_puzzle_line(board)
+    assert len(line) == 256
+    assert set(line) <= set("0123456789ABCDEFG")
+    assert parse_puzzle_line(line.lower()) == board
+
+
+def test_dots_are_blanks():
+    line = "." * 80 + "5"
+    board = parse_puzzle_line(line)
+    assert board[8][8] == 5
+    assert format_puzzle_line(board) == "0" * 80 + "5"
+
+
+def test_binary_round_trip(tmp_path):
+    boards = boards_of(9, 7)
+    path = tmp_path / "puzzles.bin"
+    assert write_binary_puzzles(path, boards[:4]) == 4
+    assert write_binary_puzzles(path, boards[4:], append=True) == 3
+    assert count_binary_puzzles(path) == 7
+    assert list(read_binary_puzzles(path)) == boards
+    assert list(read_binary_puzzles(path, 2, 5)) == boards[2:5]
+    assert unpack_board(pack_board(boards[0])) == boards[0]
+
+
+def test_binary_format_is_9x9_only():
+    with pytest.raises(ValueError):
+        pack_board(boards_of(16, 1)[0])
+
+
+@pytest.mark.parametrize("line", ["123", "x" * 81, "H" * 256])
+def test_invalid_line(line):
+    with pytest.raises(ValueError):
+        parse_puzzle_line(line)
+
+
+def test_invalid_line_number():
+    good = format_puzzle_line(boards_of(9, 1)[0])
+    stream = io.StringIO(f"# corpus\n{good}\n\n{good}\n123\n")
+    puzzles = read_puzzles(stream)
+    next(puzzles)
+    next(puzzles)
+    with pytest.raises(ValueError, match="line 5: invalid puzzle"):
+        next(puzzles)